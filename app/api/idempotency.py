@@ -1,12 +1,15 @@
 # app/api/idempotency.py
-import json
+import hashlib
 import logging
+from functools import lru_cache
 from typing import Callable
+import orjson
 from fastapi import Request, Response, status
 from fastapi.routing import APIRoute
 from starlette.responses import JSONResponse
 from app.core.redis_client import get_redis_client
-from app.core.config import settings
+from app.core.config import get_settings
+from app.core.user_id import is_valid_user_id
 
 # Define which methods are considered for idempotency
 IDEMPOTENT_METHODS = {"POST", "PUT", "DELETE", "PATCH"}
@@ -14,6 +17,27 @@ CACHE_TTL_SECONDS = 24 * 60 * 60  # 24 hours
 LOCK_TTL_SECONDS = 10 # Short lock to prevent race conditions
 logger = logging.getLogger(__name__)
 
+# Checks for a cached response and takes the lock in one atomic round-trip.
+# Returns {1, cached} on a hit, {0} when the lock was acquired and {2} when it is already held.
+ACQUIRE_SCRIPT = """
+local cached = redis.call('GET', KEYS[1])
+if cached then
+    return {1, cached}
+end
+if redis.call('SET', KEYS[2], '1', 'NX', 'EX', ARGV[1]) then
+    return {0}
+end
+return {2}
+"""
+LOCK_ACQUIRED = 0
+CACHE_HIT = 1
+
+
+@lru_cache(maxsize=8)
+def _acquire_script(redis_client):
+    return redis_client.register_script(ACQUIRE_SCRIPT)
+
+
 class IdempotentAPIRoute(APIRoute):
     def get_route_handler(self) -> Callable:
         original_handler = super().get_route_handler()
@@ -31,59 +55,76 @@ class IdempotentAPIRoute(APIRoute):
                     status_code=status.HTTP_400_BAD_REQUEST,
                     content={"detail": "X-User-ID and Idempotency-Key headers are required for this operation."}
                 )
+            # Checked here, before the user id becomes part of any Redis key.
+            if not is_valid_user_id(user_id):
+                return JSONResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    content={"detail": "X-User-ID header is malformed."}
+                )
 
             redis = get_redis_client()
+            debug = get_settings().IDEMPOTENCY_DEBUG
             cache_key = f"idempotency:{user_id}:{idempotency_key}"
             lock_key = f"{cache_key}:lock"
+            # Starlette caches the body on the request, so the route handler can still read it.
+            request_hash = hashlib.sha256(await request.body()).hexdigest()
 
-            # 1. Check for a cached response
-            cached_response_data = await redis.get(cache_key)
-            if cached_response_data:
-                if settings.IDEMPOTENCY_DEBUG:
+            # 1. Check for a cached response and lock the key in a single script call
+            outcome = await _acquire_script(redis)(keys=[cache_key, lock_key], args=[LOCK_TTL_SECONDS])
+            if outcome[0] == CACHE_HIT:
+                if debug:
                     logger.info("Idempotency cache hit for %s", cache_key)
-                cached = json.loads(cached_response_data)
+                cached = orjson.loads(outcome[1])
+                # Records written before the hash was stored carry none and are replayed as-is.
+                if cached.get("request_hash", request_hash) != request_hash:
+                    return JSONResponse(
+                        status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                        content={"detail": "This Idempotency-Key was already used with a different request body."}
+                    )
                 return Response(
                     content=cached["body"],
                     status_code=cached["status_code"],
                     headers=cached["headers"]
                 )
-            elif settings.IDEMPOTENCY_DEBUG:
-                logger.info("Idempotency cache miss for %s", cache_key)
-
-            # 2. Lock the key to prevent race conditions
-            if not await redis.set(lock_key, "1", nx=True, ex=LOCK_TTL_SECONDS):
-                if settings.IDEMPOTENCY_DEBUG:
+            if outcome[0] != LOCK_ACQUIRED:
+                if debug:
                     logger.info("Idempotency lock contention for %s", cache_key)
                 return JSONResponse(
                     status_code=status.HTTP_409_CONFLICT,
                     content={"detail": "A request with this Idempotency-Key is already in progress."}
                 )
+            if debug:
+                logger.info("Idempotency cache miss for %s", cache_key)
 
+            lock_released = False
             try:
-                # 3. Execute the original request handler
+                # 2. Execute the original request handler
                 response: Response = await original_handler(request)
 
-                # 4. Cache the response if it's a success or a client error worth caching
+                # 3. Cache the response if it's a success or a client error worth caching,
+                # releasing the lock in the same round-trip
                 if 200 <= response.status_code < 500:
-                    # We need to read the body to cache it.
-                    # A response body can only be read once, so we must then create a new response.
-                    response_body = response.body
-                    
                     response_data_to_cache = {
                         "status_code": response.status_code,
                         "headers": dict(response.headers),
-                        "body": response_body.decode("utf-8")
+                        "body": response.body.decode("utf-8"),
+                        "request_hash": request_hash,
                     }
-                    await redis.set(cache_key, json.dumps(response_data_to_cache), ex=CACHE_TTL_SECONDS)
-                    if settings.IDEMPOTENCY_DEBUG:
+                    async with redis.pipeline(transaction=True) as pipe:
+                        pipe.set(cache_key, orjson.dumps(response_data_to_cache), ex=CACHE_TTL_SECONDS)
+                        pipe.delete(lock_key)
+                        await pipe.execute()
+                    lock_released = True
+                    if debug:
                         logger.info("Cached response for %s", cache_key)
-                
+
                 return response
 
             finally:
-                # 5. Release the lock
-                await redis.delete(lock_key)
-                if settings.IDEMPOTENCY_DEBUG:
+                # 4. Release the lock if the cache write did not already do so
+                if not lock_released:
+                    await redis.delete(lock_key)
+                if debug:
                     logger.info("Released idempotency lock for %s", cache_key)
 
         return idempotent_handler
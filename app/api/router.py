@@ -1,156 +1,244 @@
 # app/api/router.py
-from uuid import UUID
-from fastapi import APIRouter, Depends, status, HTTPException, Response, Header, Request
-from pydantic import BaseModel
-from app.models.graph import Node, Graph, Edge, NodeUpdate, NodeCreate
+from dataclasses import dataclass
+from typing import AsyncIterator
+from functools import lru_cache
+from fastapi import APIRouter, Depends, status, HTTPException, Response, Header
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from app.models.graph import Node, Graph, Edge, NodeUpdate, NodeCreate, UUIDStr
 from app.models.prompt import PromptDocument, PromptUpdate
 from app.services.graph_service import GraphService
 from app.db.driver import get_db_driver
+from app.db.session import request_session_scope
 from neo4j import AsyncDriver
 from app.core.exceptions import NodeNotFoundException
 from app.services.prompt_service import PromptService
-from app.core.limiter import limiter
+from app.services.dependencies import get_prompt_service
+from app.services.task_service import ActionTaskService, EMPTY_RESULT_DETAIL
 from app.api.idempotency import IdempotentAPIRoute
+from app.core.user_id import is_valid_user_id
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 router.route_class = IdempotentAPIRoute
 
-prompt_service = PromptService()
-
 # --- New Request Model ---
 class ActionRequest(BaseModel):
     action_key: str
-    selected_node_ids: list[UUID]
+    selected_node_ids: list[UUIDStr]
+
+class TaskAccepted(BaseModel):
+    task_id: str
+
+# Upper bound on items per batch request, keeping one request's embedding fan-out and write bounded.
+MAX_BATCH_ITEMS = 1000
+
+class NodeBatch(BaseModel):
+    nodes: list[NodeCreate] = Field(max_length=MAX_BATCH_ITEMS)
+
+class EdgeBatch(BaseModel):
+    edges: list[Edge] = Field(max_length=MAX_BATCH_ITEMS)
 
 # Dependency to extract the User ID from a header
 def get_user_id(x_user_id: str = Header(..., description="Client-generated unique ID for the user workspace.")) -> str:
     if not x_user_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="X-User-ID header is required.")
+    if not is_valid_user_id(x_user_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="X-User-ID header is malformed.")
     return x_user_id
 
-def get_prompt_service() -> PromptService:
-    return prompt_service
+def _model_response(model: BaseModel, etag: str | None = None) -> Response:
+    """Serializes a service-built model once in pydantic-core, bypassing response_model validation."""
+    headers = {"ETag": etag} if etag else None
+    return Response(content=model.model_dump_json(), media_type="application/json", headers=headers)
 
-def get_service(
-    driver: AsyncDriver = Depends(get_db_driver),
-    prompt_service: PromptService = Depends(get_prompt_service)
-) -> GraphService:
+def _workspace_etag(user_id: str, version: int | None) -> str | None:
+    # Without a version (Redis down) there is no ETag, so the full body is always served.
+    if version is None:
+        return None
+    return f'W/"{user_id}-{version}"'
+
+class _SharedNoContentResponse(Response):
+    """
+    A 204 that is built once and returned from every delete route.
+    Middleware (CORS, for one) appends to the header list it is sent, so each send gets a copy.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": list(self.raw_headers)})
+        await send({"type": "http.response.body", "body": b""})
+
+_NO_CONTENT = _SharedNoContentResponse(status_code=status.HTTP_204_NO_CONTENT)
+
+@lru_cache(maxsize=1)
+def get_task_service() -> ActionTaskService:
+    return ActionTaskService()
+
+@lru_cache(maxsize=1)
+def _build_service(driver: AsyncDriver, prompt_service: PromptService) -> GraphService:
+    # GraphService is stateless per request, so one instance is shared for as long as the driver lives.
     return GraphService(driver, prompt_service)
 
+@dataclass(slots=True)
+class RequestContext:
+    user_id: str
+    service: GraphService
+
+async def get_request_context(
+    x_user_id: str = Header(..., description="Client-generated unique ID for the user workspace."),
+    driver: AsyncDriver = Depends(get_db_driver)
+) -> AsyncIterator[RequestContext]:
+    """
+    Resolves the workspace user and the shared GraphService in a single dependency,
+    and lets the request's repository calls share Neo4j sessions.
+    """
+    user_id = get_user_id(x_user_id)
+    async with request_session_scope(driver):
+        yield RequestContext(user_id, _build_service(driver, get_prompt_service()))
+
 @router.delete("/graph", status_code=status.HTTP_204_NO_CONTENT, tags=["Graph"])
-@limiter.limit("10/minute")
 async def clear_workspace(
-    request: Request,
-    user_id: str = Depends(get_user_id),
-    service: GraphService = Depends(get_service)
+    ctx: RequestContext = Depends(get_request_context)
 ):
     """Deletes all nodes and relationships for the given user's workspace."""
-    await service.clear_workspace(user_id)
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
+    await ctx.service.clear_workspace(ctx.user_id)
+    return _NO_CONTENT
 
-@router.get("/graph", response_model=Graph, tags=["Graph"])
+@router.get("/graph", responses={200: {"model": Graph}}, tags=["Graph"])
 async def get_full_graph(
-    user_id: str = Depends(get_user_id),
-    service: GraphService = Depends(get_service)
+    ctx: RequestContext = Depends(get_request_context),
+    if_none_match: str | None = Header(None)
 ):
-    return await service.get_graph(user_id)
+    # Read the version before the graph so a concurrent write can only make the ETag stale, never wrong.
+    etag = _workspace_etag(ctx.user_id, await ctx.service.get_graph_version(ctx.user_id))
+    if etag is not None and if_none_match == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return _model_response(await ctx.service.get_graph(ctx.user_id), etag)
 
 @router.post("/graph/execute-action", status_code=status.HTTP_201_CREATED, response_model=Graph, tags=["Graph Actions"])
-@limiter.limit("15/minute")
 async def execute_action(
-    request: Request,
     action_request: ActionRequest,
-    user_id: str = Depends(get_user_id),
-    service: GraphService = Depends(get_service)
+    ctx: RequestContext = Depends(get_request_context)
 ):
     """Executes a complex, prompt-driven action on the graph."""
     try:
-        created_graph = await service.execute_ai_action(
-            action_request.action_key, action_request.selected_node_ids, user_id
+        created_graph = await ctx.service.execute_ai_action(
+            action_request.action_key, action_request.selected_node_ids, ctx.user_id
         )
         if not created_graph.nodes and not created_graph.edges:
              raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="AI failed to generate a valid graph modification."
+                detail=EMPTY_RESULT_DETAIL
             )
         return created_graph
     except NodeNotFoundException as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
+@router.post("/graph/execute-action/async", status_code=status.HTTP_202_ACCEPTED, response_model=TaskAccepted, tags=["Graph Actions"])
+async def submit_action(
+    action_request: ActionRequest,
+    ctx: RequestContext = Depends(get_request_context),
+    task_service: ActionTaskService = Depends(get_task_service)
+):
+    """Queues a prompt-driven action and returns at once; follow it via GET /tasks/{task_id}/stream."""
+    task_id = await task_service.submit(
+        ctx.service, action_request.action_key, action_request.selected_node_ids, ctx.user_id
+    )
+    return TaskAccepted(task_id=task_id)
+
+@router.get("/tasks/{task_id}/stream", tags=["Graph Actions"])
+async def stream_task(
+    task_id: UUIDStr,
+    user_id: str = Depends(get_user_id),
+    task_service: ActionTaskService = Depends(get_task_service),
+    last_event_id: str | None = Header(None)
+):
+    """Streams a queued action's events as Server-Sent Events, ending with `completed` or `failed`."""
+    if not await task_service.task_exists(task_id, user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+    return StreamingResponse(
+        task_service.stream_events(task_id, user_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.post("/nodes", status_code=status.HTTP_201_CREATED, response_model=Node, tags=["Nodes"])
-@limiter.limit("60/minute")
 async def add_node(
-    request: Request,
     node_data: NodeCreate,
-    user_id: str = Depends(get_user_id),
-    service: GraphService = Depends(get_service)
+    ctx: RequestContext = Depends(get_request_context)
 ):
-    return await service.create_node(node_data, user_id)
+    return await ctx.service.create_node(node_data, ctx.user_id)
 
-@router.get("/nodes/{node_id}", response_model=Node, tags=["Nodes"])
-@limiter.limit("200/minute")
+@router.post("/nodes/batch", status_code=status.HTTP_201_CREATED, response_model=list[Node], tags=["Nodes"])
+async def add_nodes_batch(
+    batch: NodeBatch,
+    ctx: RequestContext = Depends(get_request_context)
+):
+    """Creates several nodes in one database round-trip. Nodes are returned in request order."""
+    return await ctx.service.create_nodes_batch(batch.nodes, ctx.user_id)
+
+@router.get("/nodes/{node_id}", responses={200: {"model": Node}}, tags=["Nodes"])
 async def get_node(
-    request: Request,
-    node_id: UUID,
-    user_id: str = Depends(get_user_id),
-    service: GraphService = Depends(get_service)
+    node_id: UUIDStr,
+    ctx: RequestContext = Depends(get_request_context),
+    if_none_match: str | None = Header(None)
 ):
-    node = await service.get_node(node_id, user_id)
+    etag = _workspace_etag(ctx.user_id, await ctx.service.get_graph_version(ctx.user_id))
+    if etag is not None and if_none_match == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    node = await ctx.service.get_node(node_id, ctx.user_id)
     if node is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Node not found")
-    return node
+    return _model_response(node, etag)
 
 @router.put("/nodes/{node_id}", response_model=Node, tags=["Nodes"])
-@limiter.limit("60/minute")
 async def update_node(
-    request: Request,
-    node_id: UUID,
+    node_id: UUIDStr,
     node_update: NodeUpdate,
-    user_id: str = Depends(get_user_id),
-    service: GraphService = Depends(get_service)
+    ctx: RequestContext = Depends(get_request_context)
 ):
-    updated_node = await service.update_node_properties(node_id, node_update, user_id)
+    updated_node = await ctx.service.update_node_properties(node_id, node_update, ctx.user_id)
     if updated_node is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Node not found")
     return updated_node
 
 @router.delete("/nodes/{node_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Nodes"])
-@limiter.limit("60/minute")
 async def delete_node(
-    request: Request,
-    node_id: UUID,
-    user_id: str = Depends(get_user_id),
-    service: GraphService = Depends(get_service)
+    node_id: UUIDStr,
+    ctx: RequestContext = Depends(get_request_context)
 ):
-    if not await service.delete_node(node_id, user_id):
+    if not await ctx.service.delete_node(node_id, ctx.user_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Node not found")
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
+    return _NO_CONTENT
 
 @router.post("/edges", status_code=status.HTTP_201_CREATED, response_model=Edge, tags=["Edges"])
-@limiter.limit("120/minute")
 async def add_edge(
-    request: Request,
     edge: Edge,
-    user_id: str = Depends(get_user_id),
-    service: GraphService = Depends(get_service)
+    ctx: RequestContext = Depends(get_request_context)
+):
+    try:
+        return await ctx.service.create_edge(edge, ctx.user_id)
+    except NodeNotFoundException as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.message)
+
+@router.post("/edges/batch", status_code=status.HTTP_201_CREATED, response_model=list[Edge], tags=["Edges"])
+async def add_edges_batch(
+    batch: EdgeBatch,
+    ctx: RequestContext = Depends(get_request_context)
 ):
+    """Creates several edges atomically; fails with 404 if any endpoint is missing."""
     try:
-        return await service.create_edge(edge, user_id)
+        return await ctx.service.create_edges_batch(batch.edges, ctx.user_id)
     except NodeNotFoundException as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.message)
 
 @router.delete("/edges", status_code=status.HTTP_204_NO_CONTENT, tags=["Edges"])
-@limiter.limit("120/minute")
 async def delete_edge(
-    request: Request,
     edge: Edge,
-    user_id: str = Depends(get_user_id),
-    service: GraphService = Depends(get_service)
+    ctx: RequestContext = Depends(get_request_context)
 ):
-    if not await service.delete_edge(edge, user_id):
+    if not await ctx.service.delete_edge(edge, ctx.user_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Edge not found")
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
+    return _NO_CONTENT
 
 @router.get("/prompts/{prompt_key}", response_model=PromptDocument, tags=["Prompts"])
 async def get_prompt(
@@ -1,4 +1,5 @@
 # app/core/config.py
+from functools import lru_cache
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -6,10 +7,25 @@ class Settings(BaseSettings):
     NEO4J_USER: str
     NEO4J_PASSWORD: str
     REDIS_URL: str
+    NEO4J_POOL_SIZE: int = 100
+    NEO4J_CONNECTION_ACQUISITION_TIMEOUT: float = 30.0
+    NEO4J_MAX_TRANSACTION_RETRY_TIME: float = 15.0
+    # Recycle connections before managed offerings (e.g. Aura) drop idle ones server-side.
+    NEO4J_MAX_CONNECTION_LIFETIME: float = 30 * 60
+    NEO4J_KEEP_ALIVE: bool = True
     GEMINI_API_KEY: str = ""
+    # Upper bound on concurrent Gemini generate calls; size it to the project's request quota.
+    GENAI_MAX_CONCURRENCY: int = 8
     LIMITER_STORAGE_URI: str = ""
     IDEMPOTENCY_DEBUG: bool = False
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Returns the process-wide settings, parsing the environment and .env on first use.
+    Tests can call get_settings.cache_clear() to pick up overridden variables.
+    """
+    return Settings()
+
@@ -1,6 +1,8 @@
 # app/core/exceptions.py
 class NodeNotFoundException(Exception):
     """Raised when a node is not found for a given ID."""
-    def __init__(self, message="Node not found."):
+    DEFAULT_MESSAGE = "Node not found."
+
+    def __init__(self, message: str = DEFAULT_MESSAGE):
         self.message = message
-        super().__init__(self.message)
\ No newline at end of file
+        super().__init__(message)
@@ -1,21 +1,156 @@
 # app/core/limiter.py
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from app.core.config import settings
+import json
+import logging
+import re
+from dataclasses import dataclass
+import redis.asyncio as redis
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.config import get_settings
+from app.core.redis_client import get_redis_client
+from app.core.user_id import is_valid_user_id
 
+logger = logging.getLogger(__name__)
 
-def get_user_id_key(request) -> str:
+# Fixed-window counter: increment, start the window on the first hit and report the
+# remaining TTL, all in a single atomic round-trip.
+FIXED_WINDOW_SCRIPT = """
+local current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return {current, redis.call('TTL', KEYS[1])}
+"""
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    name: str
+    method: str
+    path: re.Pattern[str]
+    limit: int
+    window_seconds: int = 60
+
+    @property
+    def description(self) -> str:
+        return f"{self.limit} per {self.window_seconds} seconds"
+
+
+RATE_LIMIT_RULES: tuple[RateLimitRule, ...] = (
+    RateLimitRule("clear_workspace", "DELETE", re.compile(r"^/graph$"), 10),
+    RateLimitRule("execute_action", "POST", re.compile(r"^/graph/execute-action$"), 15),
+    RateLimitRule("execute_action_async", "POST", re.compile(r"^/graph/execute-action/async$"), 15),
+    RateLimitRule("add_node", "POST", re.compile(r"^/nodes$"), 60),
+    RateLimitRule("add_nodes_batch", "POST", re.compile(r"^/nodes/batch$"), 10),
+    RateLimitRule("get_node", "GET", re.compile(r"^/nodes/[^/]+$"), 200),
+    RateLimitRule("update_node", "PUT", re.compile(r"^/nodes/[^/]+$"), 60),
+    RateLimitRule("delete_node", "DELETE", re.compile(r"^/nodes/[^/]+$"), 60),
+    RateLimitRule("add_edge", "POST", re.compile(r"^/edges$"), 120),
+    RateLimitRule("add_edges_batch", "POST", re.compile(r"^/edges/batch$"), 10),
+    RateLimitRule("delete_edge", "DELETE", re.compile(r"^/edges$"), 120),
+)
+
+
+def get_user_id_key(scope: Scope) -> str:
     """
-    Returns the user ID from the request header, falling back to the remote address.
+    Returns the user ID from the request header, falling back to the remote address when it is
+    missing or malformed, so junk header values never become part of a Redis key.
     """
-    user_id = request.headers.get("x-user-id")
-    return user_id or get_remote_address(request)
+    # ASGI header names are already lowercased bytes, so a linear scan avoids building a Headers mapping.
+    for name, value in scope["headers"]:
+        if name == b"x-user-id" and value:
+            user_id = value.decode("latin-1")
+            if is_valid_user_id(user_id):
+                return user_id
+            break
+    client = scope.get("client")
+    return client[0] if client else "127.0.0.1"
 
 
-storage_uri = settings.LIMITER_STORAGE_URI or settings.REDIS_URL
+_storage_client: redis.Redis | None = None
 
-limiter = Limiter(
-    key_func=get_user_id_key,
-    storage_uri=storage_uri,
-    strategy="fixed-window"
-)
+
+def get_limiter_storage() -> redis.Redis:
+    """Returns the Redis client holding rate-limit counters."""
+    global _storage_client
+    storage_uri = get_settings().LIMITER_STORAGE_URI
+    if not storage_uri:
+        return get_redis_client()
+    if _storage_client is None:
+        _storage_client = redis.from_url(storage_uri, decode_responses=True)
+    return _storage_client
+
+
+async def warm_up_limiter_storage() -> None:
+    """Connects to the limiter store and preloads the Lua script before traffic arrives."""
+    storage = get_limiter_storage()
+    await storage.ping()
+    await storage.script_load(FIXED_WINDOW_SCRIPT)
+
+
+async def close_limiter_storage() -> None:
+    """Closes the dedicated limiter client, if one was created."""
+    global _storage_client
+    if _storage_client is not None:
+        await _storage_client.close()
+        _storage_client = None
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI fixed-window rate limiter.
+    Requests that match no rule (health checks, OPTIONS, prompts) pass straight through.
+    """
+
+    def __init__(self, app: ASGIApp, rules: tuple[RateLimitRule, ...] = RATE_LIMIT_RULES):
+        self.app = app
+        self._rules_by_method: dict[str, tuple[RateLimitRule, ...]] = {}
+        for rule in rules:
+            self._rules_by_method[rule.method] = self._rules_by_method.get(rule.method, ()) + (rule,)
+        self._script = None
+
+    def _match(self, scope: Scope) -> RateLimitRule | None:
+        for rule in self._rules_by_method.get(scope["method"], ()):
+            if rule.path.match(scope["path"]):
+                return rule
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rule = self._match(scope)
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        storage = get_limiter_storage()
+        if self._script is None:
+            self._script = storage.register_script(FIXED_WINDOW_SCRIPT)
+        key = f"ratelimit:{rule.name}:{get_user_id_key(scope)}"
+        try:
+            current, ttl = await self._script(keys=[key], args=[rule.window_seconds], client=storage)
+        except (redis.RedisError, OSError) as exc:
+            # Fail open: an unavailable limiter store should not take the API down with it.
+            logger.warning("Rate limiter unavailable, allowing request: %s", exc)
+            await self.app(scope, receive, send)
+            return
+
+        if int(current) > rule.limit:
+            await self._reject(send, rule, int(ttl))
+            return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _reject(send: Send, rule: RateLimitRule, ttl: int) -> None:
+        body = json.dumps({"error": f"Rate limit exceeded: {rule.description}"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(max(ttl, 1)).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,5 +1,7 @@
 # app/core/prompts.py
 # This file is the single source of truth for all AI prompt engineering.
+import sys
+from types import MappingProxyType
 
 EXPAND_NODE_PROMPT = """
 You are an expert knowledge graph assistant.
@@ -48,6 +50,10 @@ Respond with ONLY a valid JSON object in the following format:
 - "label": The relationship type as a string.
 """.strip()
 
-DEFAULT_PROMPTS = {
-    "expand-node": EXPAND_NODE_PROMPT,
-}
\ No newline at end of file
+# Read-only, with interned keys and prompts stripped once at import.
+DEFAULT_PROMPTS = MappingProxyType({
+    sys.intern(key): prompt.strip()
+    for key, prompt in {
+        "expand-node": EXPAND_NODE_PROMPT,
+    }.items()
+})
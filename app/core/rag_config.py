@@ -9,4 +9,13 @@ SIMILARITY_THRESHOLD = 0.75
 VECTOR_DIMENSIONS = 768
 
 # The maximum number of candidate nodes to retrieve from the vector index for consideration.
-MAX_SEMANTIC_CANDIDATES = 100
\ No newline at end of file
+MAX_SEMANTIC_CANDIDATES = 100
+
+# The vector index is shared by all workspaces and filtered by userId after the search, so it is
+# asked for this many times more neighbors than we keep to preserve recall for small workspaces.
+SEMANTIC_OVERFETCH_FACTOR = 4
+
+# Upper bounds on the existing-concepts list sent with every AI action. Direct neighbors come
+# first, then semantic matches by descending score, so truncation drops the weakest matches.
+MAX_CONTEXT_NODES = 40
+MAX_DESC_CHARS = 300
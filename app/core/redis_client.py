@@ -1,28 +1,43 @@
 # app/core/redis_client.py
 import redis.asyncio as redis
-from app.core.config import settings
+from app.core.config import get_settings
 
 class RedisClient:
     _client: redis.Redis | None = None
+    _binary_client: redis.Redis | None = None
 
     @classmethod
     def get_client(cls) -> redis.Redis:
         """Returns a shared Redis client instance."""
         if cls._client is None:
             cls._client = redis.from_url(
-                settings.REDIS_URL,
+                get_settings().REDIS_URL,
                 encoding="utf-8",
                 decode_responses=True
             )
         return cls._client
 
+    @classmethod
+    def get_binary_client(cls) -> redis.Redis:
+        """Returns a shared client that leaves values as bytes, for packed binary payloads."""
+        if cls._binary_client is None:
+            cls._binary_client = redis.from_url(get_settings().REDIS_URL, decode_responses=False)
+        return cls._binary_client
+
     @classmethod
     async def close_client(cls):
-        """Closes the shared Redis client instance."""
+        """Closes the shared Redis client instances."""
         if cls._client:
             await cls._client.close()
             cls._client = None
+        if cls._binary_client:
+            await cls._binary_client.close()
+            cls._binary_client = None
 
 def get_redis_client() -> redis.Redis:
     """Dependency to get the Redis client."""
-    return RedisClient.get_client()
\ No newline at end of file
+    return RedisClient.get_client()
+
+def get_binary_redis_client() -> redis.Redis:
+    """Dependency to get the bytes-valued Redis client."""
+    return RedisClient.get_binary_client()
@@ -0,0 +1,10 @@
+# app/core/user_id.py
+import re
+
+# Client-generated IDs are UUIDs; anything else that is not a short URL-safe token is rejected
+# before it is used in a Redis key or a Neo4j query.
+USER_ID_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+def is_valid_user_id(user_id: str | None) -> bool:
+    # fullmatch, because "$" would also accept a trailing newline.
+    return bool(user_id) and USER_ID_RE.fullmatch(user_id) is not None
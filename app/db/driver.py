@@ -1,6 +1,6 @@
 # app\db\driver.py
 from neo4j import AsyncGraphDatabase, AsyncDriver
-from app.core.config import settings
+from app.core.config import get_settings
 
 class Neo4jDriver:
     _driver: AsyncDriver | None = None
@@ -8,12 +8,16 @@ class Neo4jDriver:
     @classmethod
     async def get_driver(cls) -> AsyncDriver:
         if cls._driver is None:
+            settings = get_settings()
             cls._driver = AsyncGraphDatabase.driver(
                 settings.NEO4J_URI,
                 auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
-                max_connection_pool_size=50,
+                max_connection_pool_size=settings.NEO4J_POOL_SIZE,
+                connection_acquisition_timeout=settings.NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
                 connection_timeout=30,
-                max_transaction_retry_time=30,
+                max_transaction_retry_time=settings.NEO4J_MAX_TRANSACTION_RETRY_TIME,
+                max_connection_lifetime=settings.NEO4J_MAX_CONNECTION_LIFETIME,
+                keep_alive=settings.NEO4J_KEEP_ALIVE,
             )
         return cls._driver
 
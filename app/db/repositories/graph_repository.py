@@ -1,12 +1,182 @@
 # app/db/repositories/graph_repository.py
-from uuid import UUID
-from neo4j import AsyncDriver
+import asyncio
+import itertools
+from functools import lru_cache
+from typing import Final
+from neo4j import AsyncDriver, READ_ACCESS, WRITE_ACCESS
 from app.models.graph import Node, Edge, Graph, NodeUpdate
 from app.core.exceptions import NodeNotFoundException
+from app.db.session import execute_query, open_session
+from app.core.cache import TTLCache
+from app.core.rag_config import SEMANTIC_OVERFETCH_FACTOR
+
+# Rows read back from Neo4j were validated on the way in (ids are UUIDStr at the API boundary
+# or generated server-side), so they are built with model_construct instead of re-checking
+# every id pattern and embedding float.
+def _node_from_record(value) -> Node:
+    return Node.model_construct(**value)
+
+def _nodes_from_records(values) -> list[Node]:
+    return [Node.model_construct(**value) for value in values]
+
+def _edges_from_records(values) -> list[Edge]:
+    return [Edge.model_construct(**value) for value in values]
+
+# Short-lived cache for hot reads; any write to a workspace invalidates all of that user's entries.
+# Cached Node and Graph instances are handed to every caller, so they must be treated as read-only.
+READ_CACHE_MAXSIZE = 10_000
+READ_CACHE_TTL_SECONDS = 120
+
+# Subgraphs with at least this many edges create them in parallel transactions, sharded by source node.
+EDGE_SHARD_THRESHOLD = 500
+EDGE_SHARD_COUNT = 8  # a divisor of 16, so hex-digit sharding stays even
+
+def _node_projection(variable: str, include_embeddings: bool) -> str:
+    """Returns the node itself, or a map projection that leaves the embedding vector on the server."""
+    if include_embeddings:
+        return variable
+    return f"{variable} {{.id, .name, .description, .userId}}"
+
+# Query text is built once at import; only parameters vary per call, so Neo4j reuses cached plans.
+_Q_DELETE_WORKSPACE: Final[str] = "MATCH (n:Concept {userId: $userId}) DETACH DELETE n"
+
+_Q_WORKSPACE_EDGES: Final[str] = """
+MATCH (n:Concept {userId: $userId})-[r]->(m:Concept {userId: $userId})
+RETURN {source_id: n.id, target_id: m.id, label: type(r)} AS edge
+"""
+
+_Q_ADD_EDGE: Final[str] = """
+MATCH (a:Concept {id: $source_id, userId: $userId}), (b:Concept {id: $target_id, userId: $userId})
+CALL apoc.create.relationship(a, $rel_type, {}, b) YIELD rel
+RETURN count(rel)
+"""
+
+@lru_cache(maxsize=64)
+def _update_node_query(keys: tuple[str, ...]) -> str:
+    """
+    One query per set of updated properties, so each shape keeps a stable cached plan.
+    Keys come from NodeUpdate's declared fields, never from raw client input.
+    """
+    assignments = ", ".join(f"n.{key} = $props.{key}" for key in keys)
+    return f"MATCH (n:Concept {{id: $node_id, userId: $userId}}) SET {assignments} RETURN n"
+
+_Q_ADD_NODE: Final[str] = """
+MERGE (n:Concept {id: $node_id})
+ON CREATE SET
+    n.name = $name,
+    n.description = $description,
+    n.embedding = $embedding,
+    n.userId = $userId
+RETURN n
+"""
+
+_Q_GET_NODE_BY_ID: Final[str] = "MATCH (n:Concept {id: $node_id, userId: $userId}) RETURN n"
+
+_Q_GET_NODES_BY_IDS: Final[str] = """
+UNWIND range(0, size($node_ids) - 1) AS idx
+MATCH (n:Concept {id: $node_ids[idx], userId: $userId})
+RETURN n
+ORDER BY idx
+"""
+
+_Q_DELETE_NODE: Final[str] = "MATCH (n:Concept {id: $node_id, userId: $userId}) DETACH DELETE n"
+
+_Q_DELETE_EDGE: Final[str] = """
+MATCH (a:Concept {id: $source_id, userId: $userId})-[r]->(b:Concept {id: $target_id, userId: $userId})
+WHERE type(r) = $rel_type
+DELETE r
+"""
+
+_Q_MERGE_NODES: Final[str] = """
+UNWIND $nodes AS nodeData
+MERGE (n:Concept {id: nodeData.id})
+ON CREATE SET
+    n.name = nodeData.name,
+    n.description = nodeData.description,
+    n.embedding = nodeData.embedding,
+    n.userId = nodeData.userId
+RETURN n
+"""
+
+_Q_CREATE_EDGES: Final[str] = """
+UNWIND $edges AS edgeData
+MATCH (source:Concept {id: edgeData.source_id, userId: $userId}),
+      (target:Concept {id: edgeData.target_id, userId: $userId})
+CALL apoc.create.relationship(source, edgeData.label, {}, target) YIELD rel
+RETURN count(rel)
+"""
+
+_Q_WORKSPACE_NODES: Final[dict[bool, str]] = {
+    include: f"MATCH (n:Concept {{userId: $userId}}) RETURN {_node_projection('n', include)} as n"
+    for include in (False, True)
+}
+
+# Neighbors of every selected node, plus a single similarity ranking for the whole selection:
+# each node is scored by its best match against any query vector, then the top $limit are kept.
+# UNION removes neighbors shared by several selected nodes, so every node is returned once.
+# The vector search is skipped when the neighbors alone already reach $limit, and sources without
+# a vector only contribute their neighbors.
+_Q_SELECTION_CONTEXT: Final[dict[bool, str]] = {
+    include: f"""
+    CALL {{
+        UNWIND $sources AS src
+        MATCH (:Concept {{id: src.id, userId: $userId}})--(neighbor:Concept)
+        WHERE neighbor.userId = $userId AND NOT neighbor.id IN $source_ids
+        RETURN neighbor AS n, 'structural' AS kind, null AS score
+        UNION
+        OPTIONAL MATCH (source:Concept {{userId: $userId}})--(neighbor:Concept {{userId: $userId}})
+        WHERE source.id IN $source_ids AND NOT neighbor.id IN $source_ids
+        WITH collect(DISTINCT neighbor.id) AS neighbor_ids
+        WHERE size(neighbor_ids) < $limit
+        WITH neighbor_ids + $source_ids AS excluded
+        UNWIND $sources AS src
+        WITH src, excluded
+        WHERE src.vector IS NOT NULL
+        CALL db.index.vector.queryNodes('concept_embeddings', $candidates, src.vector)
+        YIELD node, score
+        WHERE score >= $threshold AND node.userId = $userId AND NOT node.id IN excluded
+        WITH node, max(score) AS score
+        ORDER BY score DESC
+        LIMIT $limit
+        RETURN node AS n, 'semantic' AS kind, score
+    }}
+    RETURN {_node_projection("n", include)} as n, kind
+    ORDER BY score DESC
+    """
+    for include in (False, True)
+}
 
 class GraphRepository:
     def __init__(self, driver: AsyncDriver):
         self.driver = driver
+        self._cache = TTLCache(maxsize=READ_CACHE_MAXSIZE, ttl=READ_CACHE_TTL_SECONDS)
+        # Bounded like the cache itself. Generations come from one increasing counter and a
+        # forgotten user gets a fresh one, so eviction only ever acts as an invalidation.
+        self._generations = TTLCache(maxsize=READ_CACHE_MAXSIZE, ttl=READ_CACHE_TTL_SECONDS)
+        self._generation_counter = itertools.count(1)
+
+    def _cache_key(self, user_id: str, *parts) -> tuple:
+        # Keys embed the workspace generation, so a read that raced a write can only ever
+        # store its result under a generation that is already stale.
+        generation = self._generations.get(user_id)
+        if generation is None:
+            generation = next(self._generation_counter)
+            self._generations.set(user_id, generation)
+        return (user_id, generation, *parts)
+
+    def _invalidate(self, user_id: str | None) -> None:
+        self._generations.set(user_id, next(self._generation_counter))
+
+    def _write_session(self):
+        """Session for multi-statement write transactions."""
+        return open_session(self.driver, WRITE_ACCESS)
+
+    async def _read(self, query: str, parameters: dict):
+        """Single read-only statement, which cluster deployments can route to followers."""
+        return await execute_query(self.driver, query, parameters, READ_ACCESS)
+
+    async def _write(self, query: str, parameters: dict):
+        return await execute_query(self.driver, query, parameters, WRITE_ACCESS)
 
     async def delete_all_nodes_for_user(self, user_id: str) -> int:
         """
@@ -14,68 +184,103 @@ class GraphRepository:
         Returns the number of nodes deleted.
         """
         
-        query = "MATCH (n:Concept {userId: $userId}) DETACH DELETE n RETURN count(n) as deleted_count"
-        async with self.driver.session() as session:
-            result = await session.run(query, {"userId": user_id})
-            record = await result.single()
-            return record["deleted_count"] if record else 0
-
-    async def get_full_graph(self, user_id: str) -> Graph:
-        query = """
-        MATCH (n:Concept {userId: $userId})
-        OPTIONAL MATCH (n)-[r]->(m:Concept {userId: $userId})
-        RETURN collect(DISTINCT n) as nodes, collect(DISTINCT r) as relationships
-        """
-        async with self.driver.session() as session:
-            result = await session.run(query, {"userId": user_id})
-            record = await result.single()
-            # ... (rest of the function is unchanged)
-            if not record or not record["nodes"]:
-                return Graph(nodes=[], edges=[])
-
-            nodes_data = record["nodes"]
-            rels_data = record["relationships"]
-
-            nodes = [Node.model_validate(node_props) for node_props in nodes_data]
-
-            edges = []
-            for rel in rels_data:
-                if rel is None:
-                    continue
-                start_node_id = rel.start_node["id"]
-                end_node_id = rel.end_node["id"]
-                edges.append(
-                    Edge(
-                        source_id=start_node_id,
-                        target_id=end_node_id,
-                        label=rel.type
-                    )
-                )
-
-            return Graph(nodes=nodes, edges=edges)
+        summary = (await self._write(_Q_DELETE_WORKSPACE, {"userId": user_id})).summary
+        self._invalidate(user_id)
+        return summary.counters.nodes_deleted
+
+    async def get_full_graph(self, user_id: str, include_embeddings: bool = False) -> Graph:
+        """Fetches nodes and edges with two concurrent eager queries instead of collecting them into one record."""
+        cache_key = self._cache_key(user_id, "graph", include_embeddings)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+        nodes, edges = await asyncio.gather(
+            self._fetch_workspace_nodes(user_id, include_embeddings),
+            self._fetch_workspace_edges(user_id),
+        )
+        # The queries run in separate transactions; drop edges whose endpoint was deleted in between.
+        node_ids = {node.id for node in nodes}
+        edges = [edge for edge in edges if edge.source_id in node_ids and edge.target_id in node_ids]
+        graph = Graph(nodes=nodes, edges=edges)
+        self._cache.set(cache_key, graph)
+        return graph
+
+    async def _fetch_workspace_nodes(self, user_id: str, include_embeddings: bool) -> list[Node]:
+        records = (await self._read(_Q_WORKSPACE_NODES[include_embeddings], {"userId": user_id})).records
+        return _nodes_from_records([record["n"] for record in records])
+
+    async def _fetch_workspace_edges(self, user_id: str) -> list[Edge]:
+        records = (await self._read(_Q_WORKSPACE_EDGES, {"userId": user_id})).records
+        return _edges_from_records([record["edge"] for record in records])
 
     async def add_edge(self, edge: Edge, user_id: str) -> Edge:
-        query = """
-        MATCH (a:Concept {id: $source_id, userId: $userId})
-        MATCH (b:Concept {id: $target_id, userId: $userId})
-        CALL apoc.create.relationship(a, $rel_type, {}, b) YIELD rel
-        RETURN type(rel) as label
-        """
-        async with self.driver.session() as session:
-            result = await session.run(query, {
-                "source_id": str(edge.source_id),
-                "target_id": str(edge.target_id),
-                "rel_type": edge.label,
-                "userId": user_id
-            })
-            if await result.single() is None:
-                raise NodeNotFoundException("One or both nodes for the edge not found in this workspace.")
-            return edge
+        summary = (await self._write(_Q_ADD_EDGE, {
+            "source_id": edge.source_id,
+            "target_id": edge.target_id,
+            "rel_type": edge.label,
+            "userId": user_id
+        })).summary
+        if summary.counters.relationships_created == 0:
+            raise NodeNotFoundException("One or both nodes for the edge not found in this workspace.")
+        self._invalidate(user_id)
+        return edge
     
-    async def add_subgraph(self, nodes: list[Node], edges: list[Edge]) -> None:
-        nodes_payload = [
+    async def add_edges(self, edges: list[Edge], user_id: str) -> list[Edge]:
+        """
+        Creates all edges in a single transaction.
+        Raises NodeNotFoundException (and rolls back) if any endpoint is missing.
+        """
+        if not edges:
+            return []
+        async with self._write_session() as session:
+            await session.execute_write(
+                self._create_subgraph, [], self._edges_payload(edges), user_id, require_all_edges=True
+            )
+        self._invalidate(user_id)
+        return edges
+
+    async def add_subgraph(self, nodes: list[Node], edges: list[Edge], user_id: str) -> None:
+        """
+        Writes the nodes and edges in one transaction. Very large subgraphs commit the nodes
+        first and then create the edges in concurrent shards, trading atomicity for throughput.
+        """
+        nodes_payload = self._nodes_payload(nodes)
+        edges_payload = self._edges_payload(edges)
+        try:
+            if len(edges_payload) < EDGE_SHARD_THRESHOLD:
+                await self._write_subgraph_part(nodes_payload, edges_payload, user_id)
+                return
+            await self._write_subgraph_part(nodes_payload, [], user_id)
+            await asyncio.gather(*[
+                self._write_subgraph_part([], shard, user_id) for shard in self._shard_edges(edges_payload)
+            ])
+        finally:
+            self._invalidate(user_id)
+
+    async def _write_subgraph_part(self, nodes_payload: list[dict], edges_payload: list[dict], user_id: str) -> None:
+        # execute_write retries only this transaction: edges are created, not merged, so
+        # re-running shards that already committed would duplicate them.
+        async with self._write_session() as session:
+            await session.execute_write(self._create_subgraph, nodes_payload, edges_payload, user_id)
+
+    @staticmethod
+    def _shard_edges(edges_payload: list[dict]) -> list[list[dict]]:
+        # All edges leaving a node land in the same shard and each shard locks its nodes in sorted
+        # order; a deadlock that still occurs on a shared target is retried by execute_write.
+        # The shard comes from the id's first hex digit, so it is the same in every process.
+        shards: list[list[dict]] = [[] for _ in range(EDGE_SHARD_COUNT)]
+        for edge in edges_payload:
+            shards[int(edge["source_id"][0], 16) % EDGE_SHARD_COUNT].append(edge)
+        return [
+            sorted(shard, key=lambda edge: (edge["source_id"], edge["target_id"]))
+            for shard in shards if shard
+        ]
+
+    @staticmethod
+    def _nodes_payload(nodes: list[Node]) -> list[dict]:
+        return [
             {
-                "id": str(node.id),
+                "id": node.id,
                 "name": node.name,
                 "description": node.description,
                 "embedding": node.embedding,
@@ -83,153 +288,150 @@ class GraphRepository:
             }
             for node in nodes
         ]
-        # ... (rest of the function is unchanged)
-        edges_payload = [
+
+    @staticmethod
+    def _edges_payload(edges: list[Edge]) -> list[dict]:
+        return [
             {
-                "source_id": str(edge.source_id),
-                "target_id": str(edge.target_id),
+                "source_id": edge.source_id,
+                "target_id": edge.target_id,
                 "label": edge.label,
             }
             for edge in edges
         ]
 
-        async with self.driver.session() as session:
-            await session.execute_write(
-                self._create_subgraph,
-                nodes_payload,
-                edges_payload,
-            )
-
     @staticmethod
-    async def _create_subgraph(tx, nodes_payload, edges_payload):
+    async def _create_subgraph(tx, nodes_payload, edges_payload, user_id, require_all_edges=False) -> list:
+        """
+        Merges the nodes and creates the edges between nodes of the user's workspace with one
+        UNWIND query each. Returns the merged node records.
+        """
+        node_records = []
         if nodes_payload:
-            node_query = """
-            UNWIND $nodes AS nodeData
-            MERGE (n:Concept {id: nodeData.id})
-            ON CREATE SET
-                n.name = nodeData.name,
-                n.description = nodeData.description,
-                n.embedding = nodeData.embedding,
-                n.userId = nodeData.userId
-            """
-            node_result = await tx.run(node_query, {"nodes": nodes_payload})
-            await node_result.consume()
-        # ... (edge query is unchanged)
+            node_result = await tx.run(_Q_MERGE_NODES, {"nodes": nodes_payload})
+            node_records = [record["n"] async for record in node_result]
         if edges_payload:
-            edge_query = """
-            UNWIND $edges AS edgeData
-            MATCH (source:Concept {id: edgeData.source_id})
-            MATCH (target:Concept {id: edgeData.target_id})
-            CALL apoc.create.relationship(source, edgeData.label, {}, target) YIELD rel
-            RETURN count(rel) as created_edges
-            """
-            edge_result = await tx.run(edge_query, {"edges": edges_payload})
-            await edge_result.consume()
-
-    async def update_node(self, node_id: UUID, node_update: NodeUpdate, user_id: str) -> Node | None:
+            edge_result = await tx.run(_Q_CREATE_EDGES, {"edges": edges_payload, "userId": user_id})
+            summary = await edge_result.consume()
+            if require_all_edges and summary.counters.relationships_created != len(edges_payload):
+                # Raising inside the transaction function rolls the whole batch back.
+                raise NodeNotFoundException("One or more nodes for the edges not found in this workspace.")
+        return node_records
+
+    async def update_node(self, node_id: str, node_update: NodeUpdate, user_id: str) -> Node | None:
         props_to_update = node_update.model_dump(exclude_unset=True)
 
         if not props_to_update:
             return await self.get_node_by_id(node_id, user_id)
 
-        query = """
-        MATCH (n:Concept {id: $node_id, userId: $userId})
-        SET n += $props
-        RETURN n
-        """
-        async with self.driver.session() as session:
-            result = await session.run(query, {"node_id": str(node_id), "props": props_to_update, "userId": user_id})
-            record = await result.single()
-            return Node.model_validate(record["n"]) if record else None
+        records = (await self._write(
+            _update_node_query(tuple(sorted(props_to_update))),
+            {"node_id": node_id, "props": props_to_update, "userId": user_id}
+        )).records
+        self._invalidate(user_id)
+        return _node_from_record(records[0]["n"]) if records else None
 
     async def add_node(self, node: Node) -> Node:
-        query = """
-        MERGE (n:Concept {id: $node_id})
-        ON CREATE SET
-            n.name = $name,
-            n.description = $description,
-            n.embedding = $embedding,
-            n.userId = $userId
-        RETURN n
-        """
-        async with self.driver.session() as session:
-            result = await session.run(query, {
-                "node_id": str(node.id),
-                "name": node.name,
-                "description": node.description,
-                "embedding": node.embedding,
-                "userId": node.userId,
-            })
-            record = await result.single()
-            return Node.model_validate(record["n"])
+        records = (await self._write(_Q_ADD_NODE, {
+            "node_id": node.id,
+            "name": node.name,
+            "description": node.description,
+            "embedding": node.embedding,
+            "userId": node.userId,
+        })).records
+        self._invalidate(node.userId)
+        return _node_from_record(records[0]["n"])
     
-    async def get_node_by_id(self, node_id: UUID, user_id: str) -> Node | None:
-        query = "MATCH (n:Concept {id: $node_id, userId: $userId}) RETURN n"
-        async with self.driver.session() as session:
-            result = await session.run(query, {"node_id": str(node_id), "userId": user_id})
-            record = await result.single()
-            return Node.model_validate(record["n"]) if record else None
-
-    async def delete_node_by_id(self, node_id: UUID, user_id: str) -> bool:
-        query = "MATCH (n:Concept {id: $node_id, userId: $userId}) DETACH DELETE n"
-        async with self.driver.session() as session:
-            result = await session.run(query, {"node_id": str(node_id), "userId": user_id})
-            summary = await result.consume()
-            return summary.counters.nodes_deleted > 0
+    async def add_nodes(self, nodes: list[Node], user_id: str) -> list[Node]:
+        if not nodes:
+            return []
+        async with self._write_session() as session:
+            node_records = await session.execute_write(
+                self._create_subgraph, self._nodes_payload(nodes), [], user_id
+            )
+        self._invalidate(user_id)
+        return _nodes_from_records(node_records)
 
-    async def delete_edge(self, edge: Edge, user_id: str) -> bool:
-        query = """
-        MATCH (a:Concept {id: $source_id, userId: $userId})
-        MATCH (b:Concept {id: $target_id, userId: $userId})
-        CALL apoc.cypher.do_it(
-            'MATCH (a)-[r:' + $rel_type + ']->(b) DELETE r RETURN count(r) as deleted_count',
-            {a: a, b: b}
-        ) YIELD value
-        RETURN value.deleted_count > 0 as was_deleted
+    async def get_node_by_id(self, node_id: str, user_id: str) -> Node | None:
+        cache_key = self._cache_key(user_id, "node", node_id)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+        records = (await self._read(_Q_GET_NODE_BY_ID, {"node_id": node_id, "userId": user_id})).records
+        if not records:
+            return None
+        node = _node_from_record(records[0]["n"])
+        self._cache.set(cache_key, node)
+        return node
+
+    async def get_nodes_by_ids(self, node_ids: list[str], user_id: str) -> list[Node]:
         """
-        async with self.driver.session() as session:
-            result = await session.run(query, {
-                "source_id": str(edge.source_id),
-                "target_id": str(edge.target_id),
-                "rel_type": edge.label,
-                "userId": user_id
-            })
-            record = await result.single()
-            return record["was_deleted"] if record else False
-    
-    async def get_1_hop_neighbors(self, node_id: UUID, user_id: str) -> list[Node]:
-        query = """
-        MATCH (source:Concept {id: $node_id, userId: $userId})--(neighbor:Concept)
-        WHERE neighbor.userId = $userId
-        RETURN DISTINCT neighbor
+        Fetches several nodes in one round-trip, in the order of node_ids.
+        Ids that do not exist in the workspace are skipped.
         """
-        async with self.driver.session() as session:
-            result = await session.run(query, {"node_id": str(node_id), "userId": user_id})
-            records = [record async for record in result]
-            return [Node.model_validate(record["neighbor"]) for record in records]
+        if not node_ids:
+            return []
+        records = (await self._read(_Q_GET_NODES_BY_IDS, {"node_ids": node_ids, "userId": user_id})).records
+        return _nodes_from_records([record["n"] for record in records])
 
-    async def find_semantically_similar_nodes(
+    async def delete_node_by_id(self, node_id: str, user_id: str) -> bool:
+        summary = (await self._write(_Q_DELETE_NODE, {"node_id": node_id, "userId": user_id})).summary
+        self._invalidate(user_id)
+        return summary.counters.nodes_deleted > 0
+
+    async def delete_edge(self, edge: Edge, user_id: str) -> bool:
+        summary = (await self._write(_Q_DELETE_EDGE, {
+            "source_id": edge.source_id,
+            "target_id": edge.target_id,
+            "rel_type": edge.label,
+            "userId": user_id
+        })).summary
+        self._invalidate(user_id)
+        return summary.counters.relationships_deleted > 0
+
+    async def get_expansion_context(
         self,
+        node_id: str,
         query_vector: list[float],
-        excluded_node_ids: list[UUID],
         user_id: str,
         threshold: float,
-        limit: int
-    ) -> list[Node]:
-        excluded_ids_str = [str(uuid) for uuid in excluded_node_ids]
-        query = """
-            CALL db.index.vector.queryNodes('concept_embeddings', $limit, $query_vector)
-            YIELD node, score
-            WHERE score >= $threshold AND node.userId = $userId AND NOT node.id IN $excluded_ids
-            RETURN node
+        limit: int,
+        include_embeddings: bool = False
+    ) -> tuple[list[Node], list[Node]]:
+        """
+        Fetches a node's 1-hop neighbors and its semantically similar nodes in one round-trip.
+        Returns (structural, semantic); semantic nodes are ordered by descending score and never
+        include the node itself or its direct neighbors, which are excluded server-side.
+        """
+        return await self.get_selection_context(
+            {node_id: query_vector}, user_id, threshold, limit, include_embeddings
+        )
+
+    async def get_selection_context(
+        self,
+        query_vectors: dict[str, list[float] | None],
+        user_id: str,
+        threshold: float,
+        limit: int,
+        include_embeddings: bool = False
+    ) -> tuple[list[Node], list[Node]]:
+        """
+        get_expansion_context for several nodes (node id -> query vector) in a single query.
+        All vectors are searched together: semantic nodes are ranked by their best score against
+        any of them, capped at `limit` overall, and exclude every selected node and its neighbors.
+        Both lists are free of duplicates and never contain a selected node. Nodes whose vector is
+        None are not searched from, and no search runs once there are `limit` neighbors.
         """
-        async with self.driver.session() as session:
-            result = await session.run(query, {
-                "limit": limit,
-                "query_vector": query_vector,
-                "threshold": threshold,
-                "excluded_ids": excluded_ids_str,
-                "userId": user_id
-            })
-            records = [record async for record in result]
-            return [Node.model_validate(record["node"]) for record in records]
\ No newline at end of file
+        if not query_vectors:
+            return [], []
+        records = (await self._read(_Q_SELECTION_CONTEXT[include_embeddings], {
+            "sources": [{"id": node_id, "vector": vector} for node_id, vector in query_vectors.items()],
+            "source_ids": list(query_vectors),
+            "limit": limit,
+            "candidates": limit * SEMANTIC_OVERFETCH_FACTOR,
+            "threshold": threshold,
+            "userId": user_id
+        })).records
+        structural = _nodes_from_records([r["n"] for r in records if r["kind"] == "structural"])
+        semantic = _nodes_from_records([r["n"] for r in records if r["kind"] == "semantic"])
+        return structural, semantic
@@ -0,0 +1,108 @@
+# app/db/session.py
+from contextlib import asynccontextmanager
+from contextvars import Context, ContextVar, copy_context
+from typing import AsyncIterator
+from neo4j import AsyncDriver, AsyncSession, EagerResult, READ_ACCESS, RoutingControl, WRITE_ACCESS
+from neo4j.exceptions import SessionExpired, ServiceUnavailable
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+class RequestSessions:
+    """
+    Neo4j sessions shared by every repository call made while handling one HTTP request.
+    Sessions are opened lazily, one per access mode, so a request that only reads never opens
+    a write session. A session runs one query at a time; calls that find it busy (for example
+    those fanned out with asyncio.gather) get a short-lived session of their own.
+    """
+
+    def __init__(self, driver: AsyncDriver):
+        self.driver = driver
+        self.closed = False
+        self._sessions: dict[str, AsyncSession] = {}
+        self._busy: set[str] = set()
+
+    def can_serve(self, driver: AsyncDriver, access_mode: str) -> bool:
+        return not self.closed and driver is self.driver and access_mode not in self._busy
+
+    @asynccontextmanager
+    async def acquire(self, access_mode: str) -> AsyncIterator[AsyncSession]:
+        self._busy.add(access_mode)
+        try:
+            session = self._sessions.get(access_mode)
+            if session is None:
+                session = self._sessions[access_mode] = self.driver.session(default_access_mode=access_mode)
+            try:
+                yield session
+            except BaseException:
+                # A failed query can leave the session unusable; the next call opens a fresh one.
+                self._sessions.pop(access_mode, None)
+                await session.close()
+                raise
+        finally:
+            self._busy.discard(access_mode)
+
+    async def close(self) -> None:
+        self.closed = True
+        sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            await session.close()
+
+
+_request_sessions: ContextVar[RequestSessions | None] = ContextVar("neo4j_request_sessions", default=None)
+
+@asynccontextmanager
+async def request_session_scope(driver: AsyncDriver) -> AsyncIterator[RequestSessions]:
+    """Shares Neo4j sessions across the repository calls made inside this scope."""
+    scope = RequestSessions(driver)
+    # Tasks spawned inside the scope copy the context; the closed flag, not a reset token,
+    # is what stops them from using these sessions after the request is done.
+    _request_sessions.set(scope)
+    try:
+        yield scope
+    finally:
+        await scope.close()
+
+def detached_context() -> Context:
+    """A copy of the current context without the request's sessions, for tasks that outlive the request."""
+    context = copy_context()
+    context.run(_request_sessions.set, None)
+    return context
+
+@asynccontextmanager
+async def open_session(driver: AsyncDriver, access_mode: str = WRITE_ACCESS) -> AsyncIterator[AsyncSession]:
+    """Yields the request's shared session when one is free, otherwise a dedicated one."""
+    scope = _request_sessions.get()
+    if scope is not None and scope.can_serve(driver, access_mode):
+        async with scope.acquire(access_mode) as session:
+            yield session
+        return
+    async with driver.session(default_access_mode=access_mode) as session:
+        yield session
+
+_ROUTING: dict[str, RoutingControl] = {READ_ACCESS: RoutingControl.READ, WRITE_ACCESS: RoutingControl.WRITE}
+
+async def execute_query(
+    driver: AsyncDriver, query: str, parameters: dict | None = None, access_mode: str = WRITE_ACCESS
+) -> EagerResult:
+    """
+    Runs a single statement and returns its records and summary. Inside a request scope it
+    reuses the request's free session; otherwise driver.execute_query runs it as a managed
+    transaction on a pooled connection, retrying transient failures.
+    """
+    scope = _request_sessions.get()
+    if scope is not None and scope.can_serve(driver, access_mode):
+        return await _run_in_scope(scope, query, parameters, access_mode)
+    return await driver.execute_query(query, parameters, routing_=_ROUTING[access_mode])
+
+# Auto-commit session.run gets no retries from the driver, unlike managed transactions
+# (execute_write, driver.execute_query), so connection-level failures on it are retried here
+# with jittered exponential backoff. A failed session is dropped, so each attempt opens a fresh one.
+@retry(
+    retry=retry_if_exception_type((SessionExpired, ServiceUnavailable)),
+    wait=wait_exponential_jitter(initial=0.1, max=2.0),
+    stop=stop_after_attempt(3),
+    reraise=True,
+)
+async def _run_in_scope(scope: RequestSessions, query: str, parameters: dict | None, access_mode: str) -> EagerResult:
+    async with scope.acquire(access_mode) as session:
+        result = await session.run(query, parameters)
+        return await result.to_eager_result()
@@ -1,29 +1,38 @@
 # app/main.py
 import asyncio
+import random
 import time
+from urllib.parse import urlsplit
 from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI, Request, status, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from neo4j.exceptions import ServiceUnavailable
-from slowapi import _rate_limit_exceeded_handler
-from slowapi.errors import RateLimitExceeded
+from fastapi.middleware.gzip import GZipMiddleware
+from neo4j import RoutingControl
+from neo4j.exceptions import ClientError, ServiceUnavailable
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from app.api import router as api_router
 from app.db.driver import Neo4jDriver
 from app.core.redis_client import RedisClient
 from app.core.exceptions import NodeNotFoundException
 from app.core.rag_config import VECTOR_DIMENSIONS
-from app.core.limiter import limiter
+from app.core.config import get_settings
+from app.core.limiter import RateLimitMiddleware, warm_up_limiter_storage, close_limiter_storage
 
 MAX_RETRIES = 10
 RETRY_DELAY = 3
+MAX_RETRY_DELAY = 30
+TCP_PROBE_TIMEOUT = 3
+DEFAULT_BOLT_PORT = 7687
 INITIALIZATION_GRACE_PERIOD = 30
 HEALTH_IDLE_THRESHOLD_SECONDS = 600
 HEALTH_REQUIRED_HEADER = "X-App-Revision"
 HEALTH_REVISION_VALUE = "2025-02-25"
+ACTIVITY_RECORD_INTERVAL_SECONDS = 1.0
+CORS_PREFLIGHT_MAX_AGE_SECONDS = 2 * 60 * 60
 neo4j_ready_event = asyncio.Event()
-_last_non_health_activity = time.time()
+_last_non_health_activity = time.monotonic()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -41,6 +50,12 @@ async def lifespan(app: FastAPI):
     except Exception as exc:
         print(f"Neo4j initialization task raised an unexpected error: {exc}")
 
+    try:
+        await warm_up_limiter_storage()
+        print("Rate limiter storage is ready.")
+    except Exception as exc:
+        print(f"Rate limiter storage is not reachable yet: {exc}")
+
     try:
         yield
     finally:
@@ -49,9 +64,13 @@ async def lifespan(app: FastAPI):
             startup_task.cancel()
             with suppress(asyncio.CancelledError):
                 await startup_task
+
+        # Background actions publish to Redis, so they are stopped before it closes.
+        await api_router.get_task_service().shutdown()
         
         await Neo4jDriver.close_driver()
         await RedisClient.close_client()
+        await close_limiter_storage()
         print("Successfully closed Neo4j and Redis connections.")
 
 async def _initialize_neo4j():
@@ -61,9 +80,17 @@ async def _initialize_neo4j():
     for attempt in range(MAX_RETRIES):
         try:
             print(f"Initializing Neo4j (attempt {attempt + 1}/{MAX_RETRIES})...")
+            await _probe_neo4j_port()
             driver = await Neo4jDriver.get_driver()
             await driver.verify_connectivity()
-            print("Successfully connected to Neo4j.")
+            settings = get_settings()
+            print(
+                "Successfully connected to Neo4j "
+                f"(pool size {settings.NEO4J_POOL_SIZE}, "
+                f"acquisition timeout {settings.NEO4J_CONNECTION_ACQUISITION_TIMEOUT}s, "
+                f"connection lifetime {settings.NEO4J_MAX_CONNECTION_LIFETIME}s, "
+                f"keep-alive {'on' if settings.NEO4J_KEEP_ALIVE else 'off'})."
+            )
             await _ensure_vector_index(driver)
             print("Neo4j initialization complete.")
             neo4j_ready_event.set()
@@ -72,8 +99,9 @@ async def _initialize_neo4j():
             if attempt + 1 == MAX_RETRIES:
                 print(f"Error: Could not connect to Neo4j after {MAX_RETRIES} attempts. Last error: {exc}")
                 raise
-            backoff = RETRY_DELAY * (attempt + 1)
-            print(f"Neo4j not ready ({exc}). Retrying in {backoff} seconds...")
+            # Exponential backoff with jitter, so a restarted fleet does not retry in lockstep.
+            backoff = min(MAX_RETRY_DELAY, RETRY_DELAY * 2 ** attempt) * (0.5 + random.random() / 2)
+            print(f"Neo4j not ready ({exc}). Retrying in {backoff:.1f} seconds...")
             await asyncio.sleep(backoff)
         except asyncio.CancelledError:
             print("Neo4j initialization task cancelled.")
@@ -82,30 +110,60 @@ async def _initialize_neo4j():
             print(f"Unexpected error while initializing Neo4j: {exc}")
             raise
 
+def _vector_index_query(quantized: bool) -> str:
+    # Quantization keeps a compact copy of every vector in the HNSW graph; the stored
+    # float property is unchanged and still used to rescore candidates.
+    quantization = ",\n        `vector.quantization.enabled`: true" if quantized else ""
+    return f"""
+    CREATE VECTOR INDEX `concept_embeddings`
+    FOR (n:Concept) ON (n.embedding)
+    OPTIONS {{ indexConfig: {{
+        `vector.dimensions`: {VECTOR_DIMENSIONS},
+        `vector.similarity_function`: 'cosine'{quantization}
+    }} }}
+    """
+
+async def _probe_neo4j_port():
+    """
+    Opens and closes a plain TCP connection to the Bolt port; a closed port fails here in
+    milliseconds instead of after a full driver handshake.
+    """
+    target = urlsplit(get_settings().NEO4J_URI)
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(target.hostname, target.port or DEFAULT_BOLT_PORT),
+            timeout=TCP_PROBE_TIMEOUT
+        )
+    except (OSError, asyncio.TimeoutError) as exc:
+        raise ServiceUnavailable(f"Bolt port unreachable: {exc!r}") from exc
+    writer.close()
+    with suppress(OSError):
+        await writer.wait_closed()
+
 async def _ensure_vector_index(driver):
     """Ensure the required vector and property indexes exist before serving traffic."""
-    async with driver.session() as session:
-        check_vector_index_query = "SHOW INDEXES YIELD name WHERE toLower(name) = 'concept_embeddings' RETURN count(*) > 0 AS indexExists"
-        result = await session.run(check_vector_index_query)
-        record = await result.single()
-        if not (record and record["indexExists"]):
-            print("Vector index 'concept_embeddings' not found. Creating it now...")
-            await session.run(
-                f"""
-                CREATE VECTOR INDEX `concept_embeddings`
-                FOR (n:Concept) ON (n.embedding)
-                OPTIONS {{ indexConfig: {{
-                    `vector.dimensions`: {VECTOR_DIMENSIONS},
-                    `vector.similarity_function`: 'cosine'
-                }} }}
-                """
-            )
-        else:
-            print("Vector index 'concept_embeddings' already exists.")
-        print("Ensuring property index on userId exists...")
-        await session.run("CREATE INDEX concept_userId IF NOT EXISTS FOR (n:Concept) ON (n.userId)")
-        print("Database indexes are configured.")
-
+    # Each statement is a one-shot, auto-routed driver.execute_query; none need a shared session.
+    check_vector_index_query = "SHOW INDEXES YIELD name WHERE toLower(name) = 'concept_embeddings' RETURN count(*) > 0 AS indexExists"
+    records, _, _ = await driver.execute_query(check_vector_index_query, routing_=RoutingControl.READ)
+    if not (records and records[0]["indexExists"]):
+        print("Vector index 'concept_embeddings' not found. Creating it now...")
+        try:
+            await driver.execute_query(_vector_index_query(quantized=True))
+        except ClientError as exc:
+            # Servers before 5.23 reject the quantization option.
+            print(f"Vector quantization unavailable ({exc.code}); creating a full-precision index.")
+            await driver.execute_query(_vector_index_query(quantized=False))
+    else:
+        print("Vector index 'concept_embeddings' already exists.")
+    print("Ensuring uniqueness constraint on Concept.id exists...")
+    # The constraint's backing index turns every id lookup into a single index seek.
+    await driver.execute_query("CREATE CONSTRAINT concept_id IF NOT EXISTS FOR (n:Concept) REQUIRE n.id IS UNIQUE")
+    print("Ensuring property index on userId exists...")
+    await driver.execute_query("CREATE INDEX concept_userId IF NOT EXISTS FOR (n:Concept) ON (n.userId)")
+    print("Ensuring composite index on (userId, id) exists...")
+    # Every user-scoped lookup filters on both properties; this makes them a single seek.
+    await driver.execute_query("CREATE INDEX concept_user_id IF NOT EXISTS FOR (n:Concept) ON (n.userId, n.id)")
+    print("Database indexes are configured.")
 
 app = FastAPI(
     title="GenAI Graph Framework API",
@@ -114,25 +172,29 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Add Limiter to the application state
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
-# Exempt all OPTIONS requests from rate limiting to prevent CORS preflight issues
-app.state.limiter.exempt_methods = ["OPTIONS"]
-
 allowed_origins = [
     "http://localhost:8000",
     "http://localhost:8080",
     "https://jonasbuffington.github.io",
 ]
 
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# Registered before CORS so that 429 responses still carry CORS headers.
+# OPTIONS requests match no rate-limit rule and are never counted.
+app.add_middleware(RateLimitMiddleware)
+
+# CORS answers preflights itself, so OPTIONS never reaches the rate limiter, GZip or the router.
+# Every API call sends custom headers and needs a preflight; caching it for Chrome's two-hour
+# maximum lets the browser skip most of them.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["Content-Type", "X-User-ID", "Idempotency-Key", "X-App-Revision"],
+    allow_headers=["Content-Type", "X-User-ID", "Idempotency-Key", "X-App-Revision", "If-None-Match", "Last-Event-ID"],
+    expose_headers=["ETag"],
+    max_age=CORS_PREFLIGHT_MAX_AGE_SECONDS,
 )
 
 @app.exception_handler(NodeNotFoundException)
@@ -144,33 +206,78 @@ async def node_not_found_exception_handler(request: Request, exc: NodeNotFoundEx
 
 app.include_router(api_router.router)
 
-@app.middleware("http")
-async def track_activity(request: Request, call_next):
-    response = await call_next(request)
-    if not request.url.path.startswith("/healthz"):
-        global _last_non_health_activity
-        _last_non_health_activity = time.time()
-    return response
+class ActivityTrackerMiddleware:
+    """Records when the last non-health request was served, without wrapping the request or response."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.app(scope, receive, send)
+        if scope["type"] == "http" and not scope["path"].startswith("/healthz"):
+            global _last_non_health_activity
+            now = time.monotonic()
+            # Idleness is measured in minutes, so one write per second is plenty.
+            if now - _last_non_health_activity >= ACTIVITY_RECORD_INTERVAL_SECONDS:
+                _last_non_health_activity = now
+
+app.add_middleware(ActivityTrackerMiddleware)
+
+def _is_internal_client(host: str) -> bool:
+    return host.startswith("10.") or host.startswith("127.") or host == "::1"
+
+class HealthProbeMiddleware:
+    """
+    Answers liveness probes on /healthz before routing, CORS, rate limiting and compression.
+    Only HEAD requests and internal GETs without an Origin header take this path; browser
+    clients still reach the full health_check route, which is also served at /healthz/full.
+    """
+
+    BODY = b'{"status":"ok"}'
+    HEADERS = [(b"content-type", b"application/json"), (b"content-length", str(len(BODY)).encode())]
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] != "/healthz" or not self._is_probe(scope):
+            await self.app(scope, receive, send)
+            return
+        await send({"type": "http.response.start", "status": 200, "headers": self.HEADERS})
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else self.BODY})
+
+    @staticmethod
+    def _is_probe(scope: Scope) -> bool:
+        if any(name == b"origin" for name, _ in scope["headers"]):
+            return False
+        if scope["method"] == "HEAD":
+            return True
+        client = scope.get("client")
+        return scope["method"] == "GET" and _is_internal_client((client[0] if client else "") or "")
+
+# Outermost, so probes skip every other middleware.
+app.add_middleware(HealthProbeMiddleware)
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the GenAI Graph Framework API"}
 
 @app.get("/healthz", tags=["Health"], status_code=status.HTTP_200_OK)
+@app.get("/healthz/full", tags=["Health"], status_code=status.HTTP_200_OK)
 async def health_check(request: Request):
     """
     Returns the operational status of the service and indicates whether
     clients should keep polling.
     """
     client_host = (request.client.host if request.client else "") or ""
-    is_internal_request = client_host.startswith("10.") or client_host.startswith("127.") or client_host == "::1"
+    is_internal_request = _is_internal_client(client_host)
     header_value = request.headers.get(HEALTH_REQUIRED_HEADER)
     require_revision = request.method == "GET" and not is_internal_request
 
     if require_revision and header_value != HEALTH_REVISION_VALUE:
         raise HTTPException(status_code=status.HTTP_410_GONE, detail="Client revision expired")
 
-    idle_seconds = time.time() - _last_non_health_activity
+    idle_seconds = time.monotonic() - _last_non_health_activity
     polling_allowed = idle_seconds < HEALTH_IDLE_THRESHOLD_SECONDS
     return {
         "status": "ok",
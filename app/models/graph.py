@@ -1,22 +1,41 @@
 # app/models/graph.py
-from uuid import UUID, uuid4
-from pydantic import BaseModel, Field
+from functools import cached_property
+from typing import Annotated
+from uuid import uuid4
+from pydantic import BaseModel, Field, StringConstraints
+
+# Canonical (lowercase, hyphenated) UUID string, the form node IDs are stored in.
+# The pattern is checked inside pydantic-core, which is much cheaper than building a uuid.UUID.
+UUIDStr = Annotated[
+    str,
+    StringConstraints(pattern=r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$"),
+]
 
 class Node(BaseModel):
-    id: UUID = Field(default_factory=uuid4)
+    id: UUIDStr = Field(default_factory=lambda: str(uuid4()))
     name: str
     description: str
-    embedding: list[float] | None = Field(default=None, repr=False)
+    # Stays a float list because Neo4j only indexes LIST<FLOAT> vectors, but is never serialized:
+    # API responses and task results skip the 768 floats the frontend does not use.
+    embedding: list[float] | None = Field(default=None, repr=False, exclude=True)
     userId: str | None = Field(default=None, repr=False)
 
+    @cached_property
+    def embedding_text(self) -> str:
+        """The document embedded for this node; computed once, so set name/description before reading it."""
+        return (
+            f"Concept Name: {self.name}\n"
+            f"Description: {self.description}"
+        )
+
 class NodeCreate(BaseModel):
     """A model for creating a new node, excluding server-set fields."""
     name: str
     description: str
 
 class Edge(BaseModel):
-    source_id: UUID
-    target_id: UUID
+    source_id: UUIDStr
+    target_id: UUIDStr
     label: str
 
 class Graph(BaseModel):
@@ -3,6 +3,7 @@ import logging
 import re
 from json import JSONDecodeError, JSONDecoder
 from typing import Any
+import orjson
 
 logger = logging.getLogger(__name__)
 
@@ -17,11 +18,15 @@ _FORBIDDEN_KEYS = {
     "thoughtSignature",
     "thoughtSignatureBlock",
 }
-_CONTROL_CHAR_REPLACEMENTS = {
+_CONTROL_CHAR_TRANSLATION = str.maketrans({
     "\u2028": "\\u2028",
     "\u2029": "\\u2029",
-}
+})
+_CONTAINER_TYPES = (dict, list)
 _VALID_SINGLE_ESCAPES = {'"', "\\", "/", "b", "f", "n", "r", "t", "u"}
+_DECODER_STRICT = JSONDecoder()
+_DECODER_LAX = JSONDecoder(strict=False)
+_DECODERS = (_DECODER_STRICT, _DECODER_LAX)
 
 
 def _strip_code_fence(text: str) -> str:
@@ -48,9 +53,7 @@ def _escape_latex_commands(text: str) -> str:
 
 
 def _normalize_control_characters(text: str) -> str:
-    for needle, replacement in _CONTROL_CHAR_REPLACEMENTS.items():
-        text = text.replace(needle, replacement)
-    return text
+    return text.translate(_CONTROL_CHAR_TRANSLATION)
 
 
 def _generate_candidates(base_text: str) -> list[str]:
@@ -68,15 +71,42 @@ def _generate_candidates(base_text: str) -> list[str]:
     return candidates
 
 
+def _contains_forbidden(payload: Any) -> bool:
+    stack = [payload]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            if not _FORBIDDEN_KEYS.isdisjoint(current.keys()):
+                return True
+            stack.extend(current.values())
+        elif isinstance(current, list):
+            stack.extend(current)
+    return False
+
+
 def _remove_forbidden_fields(payload: Any):
+    # Most payloads carry no forbidden keys; return them untouched instead of rebuilding every container.
+    if not _contains_forbidden(payload):
+        return payload
+    return _strip_forbidden_fields(payload)
+
+
+def _strip_forbidden_fields(payload: Any):
     if isinstance(payload, dict):
+        if _FORBIDDEN_KEYS.isdisjoint(payload):
+            # Nothing to drop at this level: rebuild only if a nested container might need it.
+            if not any(isinstance(value, _CONTAINER_TYPES) for value in payload.values()):
+                return payload
+            return {key: _strip_forbidden_fields(value) for key, value in payload.items()}
         return {
-            key: _remove_forbidden_fields(value)
+            key: _strip_forbidden_fields(value)
             for key, value in payload.items()
             if key not in _FORBIDDEN_KEYS
         }
     if isinstance(payload, list):
-        return [_remove_forbidden_fields(item) for item in payload]
+        if not any(isinstance(item, _CONTAINER_TYPES) for item in payload):
+            return payload
+        return [_strip_forbidden_fields(item) for item in payload]
     return payload
 
 
@@ -84,19 +114,22 @@ def parse_ai_response_text(raw_text: str) -> dict[str, Any]:
     """
     Sanitize and parse the raw model text emitted through structured outputs.
     """
+    # Structured output is almost always clean JSON, so try orjson on it as-is before any sanitizing.
+    if raw_text and raw_text.startswith(("{", "[")):
+        try:
+            return _remove_forbidden_fields(orjson.loads(raw_text))
+        except orjson.JSONDecodeError:
+            pass
+
     cleaned = _strip_code_fence(raw_text or "")
     if not cleaned.strip():
         raise JSONDecodeError("AI response payload is empty", raw_text, 0)
     cleaned = cleaned.lstrip("\ufeff")
     cleaned = _normalize_control_characters(cleaned)
 
-    decoder_strict = JSONDecoder()
-    decoder_lax = JSONDecoder(strict=False)
-    decoders = (decoder_strict, decoder_lax)
-
     last_error: JSONDecodeError | None = None
     for candidate in _generate_candidates(cleaned):
-        for decoder in decoders:
+        for decoder in _DECODERS:
             try:
                 parsed = decoder.decode(candidate)
                 return _remove_forbidden_fields(parsed)
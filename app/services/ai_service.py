@@ -2,43 +2,91 @@
 import asyncio
 import logging
 import json
-from typing import Any
-from google.genai import types
-import google.genai as genai
-from pydantic import BaseModel, ValidationError
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import TYPE_CHECKING, Any
+from pydantic import BaseModel, ConfigDict, TypeAdapter, ValidationError
+from app.core.config import get_settings
 from app.models.graph import Node, Edge
 from app.services.prompt_service import PromptService
 from app.services.ai_response_parser import parse_ai_response_text
-from uuid import UUID
+
+if TYPE_CHECKING:
+    import google.genai as genai
+    from google.genai import types
 
 logger = logging.getLogger(__name__)
 
+# Raw model output can be tens of kilobytes; debug logs only keep its head.
+MAX_DEBUG_TEXT_CHARS = 2000
+
 # Pydantic models for parsing the specific JSON structure from the LLM.
+# They are read-only once parsed; extra keys the model invents are dropped.
+_AI_MODEL_CONFIG = ConfigDict(extra="ignore", frozen=True)
+
 class AI_Node(BaseModel):
+    model_config = _AI_MODEL_CONFIG
+
     name: str
     description: str
 
 class AI_NodeIdentifier(BaseModel):
     """Identifies a node, either pre-existing or newly created."""
+    model_config = _AI_MODEL_CONFIG
+
     is_new: bool
     index: int # index in the new_nodes list or the original_nodes list
 
 class AI_Edge(BaseModel):
     """Defines a relationship between any two nodes in the context."""
+    model_config = _AI_MODEL_CONFIG
+
     source: AI_NodeIdentifier
     target: AI_NodeIdentifier
     label: str
 
 class AI_Graph(BaseModel):
     """The AI's structured output for graph modifications."""
+    model_config = _AI_MODEL_CONFIG
+
     nodes: list[AI_Node]
     edges: list[AI_Edge]
 
+_AI_GRAPH_ADAPTER = TypeAdapter(AI_Graph)
+
+@lru_cache(maxsize=1)
+def _genai_executor() -> ThreadPoolExecutor:
+    """
+    Dedicated threads for the blocking genai SDK calls. Bursts beyond the pool size queue
+    here instead of competing with every other to_thread user for the default executor.
+    """
+    return ThreadPoolExecutor(
+        max_workers=get_settings().GENAI_MAX_CONCURRENCY, thread_name_prefix="genai"
+    )
+
+@lru_cache(maxsize=1)
+def _json_generation_config() -> "types.GenerateContentConfig":
+    """The request config never varies, so it is validated once (on first use, like the SDK import)."""
+    from google.genai import types
+    return types.GenerateContentConfig(response_mime_type="application/json")
+
 class AIService:
     def __init__(self, api_key: str, prompt_service: PromptService):
-        self.client = genai.Client(api_key=api_key)
+        # The genai SDK is imported and its client built on the first AI call, keeping both
+        # off the startup path.
+        self._api_key = api_key
+        self._client_lock = asyncio.Lock()
+        self.client: "genai.Client | None" = None
         self.prompt_service = prompt_service
 
+    async def _ensure_client(self) -> "genai.Client":
+        if self.client is None:
+            async with self._client_lock:
+                if self.client is None:
+                    import google.genai as genai
+                    self.client = genai.Client(api_key=self._api_key)
+        return self.client
+
     async def generate_graph_modification(
         self,
         source_nodes: list[Node],
@@ -53,41 +101,46 @@ class AIService:
             [f'- ID {i}: "{node.name}" (Description: {node.description})' for i, node in enumerate(source_nodes)]
         )
 
-        prompt = prompt_template.format(
-            source_nodes_context=source_nodes_str,
-            existing_nodes_context=context
-        )
-
-        generation_config = types.GenerateContentConfig(
-            response_mime_type="application/json"
-        )
+        prompt = prompt_template.format_map({
+            "source_nodes_context": source_nodes_str,
+            "existing_nodes_context": context,
+        })
 
         try:
-            response = await asyncio.to_thread(
-                self.client.models.generate_content,
-                model='gemini-flash-latest',
-                contents=prompt,
-                config=generation_config
+            client = await self._ensure_client()
+            response = await asyncio.get_running_loop().run_in_executor(
+                _genai_executor(),
+                partial(
+                    client.models.generate_content,
+                    model='gemini-flash-latest',
+                    contents=prompt,
+                    config=_json_generation_config()
+                )
             )
             raw_text = self._extract_structured_text(response)
             if not raw_text:
                 logger.error("AI response did not contain structured JSON output.")
                 return [], []
             ai_graph_data = parse_ai_response_text(raw_text)
-            ai_graph = AI_Graph.model_validate(ai_graph_data)
+            ai_graph = _AI_GRAPH_ADAPTER.validate_python(ai_graph_data)
 
         except (json.JSONDecodeError, ValidationError) as e:
             logger.error("AI response parsing failed: %s", e)
-            logger.debug("Raw AI response text: %s", getattr(response, "text", "No response text available."))
+            if logger.isEnabledFor(logging.DEBUG):
+                raw_text = getattr(response, "text", None) or "No response text available."
+                logger.debug("Raw AI response text: %s", raw_text[:MAX_DEBUG_TEXT_CHARS])
             return [], []
         except Exception as e:
             logger.error("An unexpected error occurred with the Gemini API: %s", e)
             return [], []
 
-        # Convert the AI's response models into our main application models
-        new_nodes = [Node(name=ai_node.name, description=ai_node.description) for ai_node in ai_graph.nodes]
+        # Convert the AI's response models into our main application models, already owned by the workspace
+        new_nodes = [
+            Node(name=ai_node.name, description=ai_node.description, userId=user_id)
+            for ai_node in ai_graph.nodes
+        ]
         
-        def get_node_id(identifier: AI_NodeIdentifier) -> UUID | None:
+        def get_node_id(identifier: AI_NodeIdentifier) -> str | None:
             if identifier.is_new:
                 if 0 <= identifier.index < len(new_nodes):
                     return new_nodes[identifier.index].id
@@ -0,0 +1,21 @@
+# app/services/dependencies.py
+from functools import lru_cache
+from app.core.config import get_settings
+from app.services.ai_service import AIService
+from app.services.embedding_service import EmbeddingService
+from app.services.prompt_service import PromptService
+
+# Process-wide service instances. Each one holds a client (and its connection pool) that is
+# expensive to build, so it is created on first use and shared by every request.
+
+@lru_cache(maxsize=1)
+def get_prompt_service() -> PromptService:
+    return PromptService()
+
+@lru_cache(maxsize=1)
+def get_embedding_service() -> EmbeddingService:
+    return EmbeddingService(api_key=get_settings().GEMINI_API_KEY)
+
+@lru_cache(maxsize=1)
+def get_ai_service() -> AIService:
+    return AIService(api_key=get_settings().GEMINI_API_KEY, prompt_service=get_prompt_service())
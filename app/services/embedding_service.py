@@ -1,8 +1,31 @@
 import asyncio
+import hashlib
+import logging
 import os
+import threading
+import numpy as np
 import requests
 from typing import Literal
+from redis.exceptions import RedisError
 from app.core.rag_config import VECTOR_DIMENSIONS
+from app.core.redis_client import get_binary_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Embeddings depend only on the text, model and dimensionality, so they are shared across
+# workspaces. Vectors are stored as packed float32, a quarter of their JSON size.
+EMBEDDING_CACHE_KEY_TEMPLATE = "emb:{model_name}:{dimensions}:{digest}"
+EMBEDDING_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+# batchEmbedContents accepts at most 100 requests per call; larger inputs are split and sent concurrently.
+EMBEDDING_BATCH_SIZE = 100
+
+def _to_float32(embedding: list[float]) -> list[float]:
+    """
+    Rounds a fresh vector to the float32 values the cache stores, so a text embeds to the same
+    vector whether or not it was a cache hit. float32 keeps ~7 significant digits, well beyond
+    what cosine similarity between embeddings can distinguish.
+    """
+    return np.asarray(embedding, dtype=np.float32).tolist()
 
 if os.path.exists(".env"):
     from dotenv import load_dotenv
@@ -10,6 +33,7 @@ if os.path.exists(".env"):
 
 class EmbeddingService:
     _API_URL_TEMPLATE = "https://generativelanguage.googleapis.com/v1beta/models/{model_name}:embedContent"
+    _BATCH_API_URL_TEMPLATE = "https://generativelanguage.googleapis.com/v1beta/models/{model_name}:batchEmbedContents"
 
     def __init__(
         self,
@@ -21,17 +45,97 @@ class EmbeddingService:
         self.api_key = api_key
         self.model_name = model_name
         self.api_url = self._API_URL_TEMPLATE.format(model_name=self.model_name)
+        self.batch_api_url = self._BATCH_API_URL_TEMPLATE.format(model_name=self.model_name)
+        # Requests run in asyncio.to_thread workers and requests.Session is not thread-safe, so each
+        # worker thread keeps its own pooled session and its TLS connection to the API alive.
+        self._thread_local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._thread_local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({"x-goog-api-key": self.api_key, "Content-Type": "application/json"})
+            self._thread_local.session = session
+        return session
 
     def _make_request(self, text: str) -> requests.Response:
-        headers = {"x-goog-api-key": self.api_key, "Content-Type": "application/json"}
         data = {
             "model": f"models/{self.model_name}",
             "content": {"parts": [{"text": text}]},
             "output_dimensionality": VECTOR_DIMENSIONS
         }
-        return requests.post(self.api_url, headers=headers, json=data)
+        return self._session().post(self.api_url, json=data)
+
+    def _make_batch_request(self, texts: list[str]) -> requests.Response:
+        model = f"models/{self.model_name}"
+        data = {
+            "requests": [
+                {
+                    "model": model,
+                    "content": {"parts": [{"text": text}]},
+                    "output_dimensionality": VECTOR_DIMENSIONS
+                }
+                for text in texts
+            ]
+        }
+        return self._session().post(self.batch_api_url, json=data)
 
     async def get_embedding(self, text: str) -> list[float]:
+        key = self._cache_key(text)
+        cached, = await self._load_cached([key])
+        if cached is not None:
+            return cached
+        embedding = _to_float32(await self._fetch_embedding(text))
+        await self._store_cached({key: embedding})
+        return embedding
+
+    async def get_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds all texts, serving repeated ones from the Redis cache and the rest with one
+        batchEmbedContents call per EMBEDDING_BATCH_SIZE texts; results keep the order of `texts`.
+        """
+        if not texts:
+            return []
+        keys = [self._cache_key(text) for text in texts]
+        embeddings = await self._load_cached(keys)
+        missing = [index for index, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            missing_texts = [texts[index] for index in missing]
+            chunks = await asyncio.gather(*(
+                self._fetch_embeddings(missing_texts[start:start + EMBEDDING_BATCH_SIZE])
+                for start in range(0, len(missing_texts), EMBEDDING_BATCH_SIZE)
+            ))
+            fetched = [embedding for chunk in chunks for embedding in chunk]
+            for index, embedding in zip(missing, fetched):
+                embeddings[index] = _to_float32(embedding)
+            await self._store_cached({keys[index]: embeddings[index] for index in missing})
+        return embeddings
+
+    def _cache_key(self, text: str) -> str:
+        digest = hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+        return EMBEDDING_CACHE_KEY_TEMPLATE.format(
+            model_name=self.model_name, dimensions=VECTOR_DIMENSIONS, digest=digest
+        )
+
+    async def _load_cached(self, keys: list[str]) -> list[list[float] | None]:
+        # The cache is an optimization only; a Redis outage falls back to the embedding API.
+        try:
+            values = await get_binary_redis_client().mget(keys)
+        except RedisError as exc:
+            logger.warning("Embedding cache lookup failed: %s", exc)
+            return [None] * len(keys)
+        return [np.frombuffer(value, dtype=np.float32).tolist() if value else None for value in values]
+
+    async def _store_cached(self, embeddings: dict[str, list[float]]) -> None:
+        try:
+            async with get_binary_redis_client().pipeline(transaction=False) as pipe:
+                for key, embedding in embeddings.items():
+                    pipe.set(key, np.asarray(embedding, dtype=np.float32).tobytes(), ex=EMBEDDING_CACHE_TTL_SECONDS)
+                await pipe.execute()
+        except RedisError as exc:
+            logger.warning("Embedding cache write failed: %s", exc)
+
+    async def _fetch_embedding(self, text: str) -> list[float]:
         try:
             response = await asyncio.to_thread(self._make_request, text)
             response.raise_for_status()
@@ -51,6 +155,27 @@ class EmbeddingService:
             print(f"Raw response text: {response.text if 'response' in locals() else 'No response'}")
             raise
 
+    async def _fetch_embeddings(self, texts: list[str]) -> list[list[float]]:
+        try:
+            response = await asyncio.to_thread(self._make_batch_request, texts)
+            response.raise_for_status()
+
+            embeddings = [
+                item.get("values", []) for item in response.json().get("embeddings", [])
+            ]
+
+            if len(embeddings) != len(texts) or not all(embeddings):
+                raise ValueError("Failed to retrieve embeddings from batch API response.")
+
+            return embeddings
+        except requests.exceptions.RequestException as e:
+            print(f"HTTP Request failed: {e}")
+            raise
+        except (KeyError, ValueError) as e:
+            print(f"Failed to parse API response: {e}")
+            print(f"Raw response text: {response.text if 'response' in locals() else 'No response'}")
+            raise
+
 # Standalone test block
 async def main():
     """
@@ -1,105 +1,144 @@
 # app/services/graph_service.py
-from uuid import UUID
-import asyncio
+import logging
+from redis.exceptions import RedisError
 from neo4j import AsyncDriver
-from neo4j.exceptions import SessionExpired, ServiceUnavailable
 from app.models.graph import Node, Graph, Edge, NodeUpdate, NodeCreate
 from app.db.repositories.graph_repository import GraphRepository
 from app.core.exceptions import NodeNotFoundException
 from app.services.ai_service import AIService
 from app.services.embedding_service import EmbeddingService
-from app.core.rag_config import SIMILARITY_THRESHOLD, MAX_SEMANTIC_CANDIDATES
-from app.core.config import settings
+from app.core.rag_config import (
+    SIMILARITY_THRESHOLD, MAX_SEMANTIC_CANDIDATES, MAX_CONTEXT_NODES, MAX_DESC_CHARS
+)
+from app.core.config import get_settings
 from app.services.prompt_service import PromptService
+from app.services.dependencies import get_ai_service, get_embedding_service, get_prompt_service
+from app.core.redis_client import get_redis_client
 
-def _get_embedding_text_for_node(node: Node) -> str:
-    """Creates a rich, consistent text document for embedding."""
-    return (
-        f"Concept Name: {node.name}\n"
-        f"Description: {node.description}"
-    )
+logger = logging.getLogger(__name__)
+
+# Redis hash holding a per-workspace counter that every write bumps; it seeds the HTTP ETags.
+WORKSPACE_KEY_TEMPLATE = "workspace:{user_id}"
+WORKSPACE_VERSION_FIELD = "version"
 
 class GraphService:
-    def __init__(self, driver: AsyncDriver, prompt_service: PromptService | None = None):
+    def __init__(
+        self,
+        driver: AsyncDriver,
+        prompt_service: PromptService | None = None,
+        embedding_service: EmbeddingService | None = None,
+        ai_service: AIService | None = None,
+    ):
         self.repo = GraphRepository(driver)
-        self.embedding_service = EmbeddingService(api_key=settings.GEMINI_API_KEY)
-        self.prompt_service = prompt_service or PromptService()
-        self.ai_service = AIService(
-            api_key=settings.GEMINI_API_KEY,
-            prompt_service=self.prompt_service
-        )
+        self.embedding_service = embedding_service or get_embedding_service()
+        self.prompt_service = prompt_service or get_prompt_service()
+        if ai_service is None:
+            # The shared AIService reads the shared prompt store; any other store gets its own.
+            ai_service = (
+                get_ai_service() if self.prompt_service is get_prompt_service()
+                else AIService(api_key=get_settings().GEMINI_API_KEY, prompt_service=self.prompt_service)
+            )
+        self.ai_service = ai_service
     
     async def clear_workspace(self, user_id: str) -> None:
         """Clears all nodes and edges for a specific user."""
-        await self._with_retry(self.repo.delete_all_nodes_for_user, user_id)
+        await self.repo.delete_all_nodes_for_user(user_id)
+        await self._bump_graph_version(user_id)
+
+    async def get_graph_version(self, user_id: str) -> int | None:
+        """
+        Returns the workspace's write counter; it only ever increases.
+        None when Redis is unavailable, in which case callers skip conditional responses.
+        """
+        try:
+            version = await get_redis_client().hget(
+                WORKSPACE_KEY_TEMPLATE.format(user_id=user_id), WORKSPACE_VERSION_FIELD
+            )
+        except (RedisError, OSError) as exc:
+            logger.warning("Workspace version unavailable, serving without ETag: %s", exc)
+            return None
+        return int(version or 0)
 
     async def create_node(self, node_data: NodeCreate, user_id: str) -> Node:
         node = Node(**node_data.model_dump(), userId=user_id)
         await self._ensure_embedding(node)
-        return await self._with_retry(self.repo.add_node, node)
+        created = await self.repo.add_node(node)
+        await self._bump_graph_version(user_id)
+        return created
+
+    async def create_nodes_batch(self, nodes_data: list[NodeCreate], user_id: str) -> list[Node]:
+        nodes = [Node(**node_data.model_dump(), userId=user_id) for node_data in nodes_data]
+        await self._ensure_embeddings(nodes)
+        created = await self.repo.add_nodes(nodes, user_id)
+        if created:
+            await self._bump_graph_version(user_id)
+        return created
 
     async def get_graph(self, user_id: str) -> Graph:
-        return await self._with_retry(self.repo.get_full_graph, user_id)
+        return await self.repo.get_full_graph(user_id)
 
     async def create_edge(self, edge_data: Edge, user_id: str) -> Edge:
-        return await self._with_retry(self.repo.add_edge, edge_data, user_id)
-
-    async def update_node_properties(self, node_id: UUID, node_update: NodeUpdate, user_id: str) -> Node | None:
-        return await self._with_retry(self.repo.update_node, node_id, node_update, user_id)
+        created = await self.repo.add_edge(edge_data, user_id)
+        await self._bump_graph_version(user_id)
+        return created
+
+    async def create_edges_batch(self, edges: list[Edge], user_id: str) -> list[Edge]:
+        created = await self.repo.add_edges(edges, user_id)
+        if created:
+            await self._bump_graph_version(user_id)
+        return created
+
+    async def update_node_properties(self, node_id: str, node_update: NodeUpdate, user_id: str) -> Node | None:
+        updated = await self.repo.update_node(node_id, node_update, user_id)
+        if updated is not None:
+            await self._bump_graph_version(user_id)
+        return updated
     
-    async def get_node(self, node_id: UUID, user_id: str) -> Node | None:
-        return await self._with_retry(self.repo.get_node_by_id, node_id, user_id)
+    async def get_node(self, node_id: str, user_id: str) -> Node | None:
+        return await self.repo.get_node_by_id(node_id, user_id)
 
-    async def delete_node(self, node_id: UUID, user_id: str) -> bool:
-        return await self._with_retry(self.repo.delete_node_by_id, node_id, user_id)
+    async def delete_node(self, node_id: str, user_id: str) -> bool:
+        deleted = await self.repo.delete_node_by_id(node_id, user_id)
+        if deleted:
+            await self._bump_graph_version(user_id)
+        return deleted
 
     async def delete_edge(self, edge_data: Edge, user_id: str) -> bool:
-        return await self._with_retry(self.repo.delete_edge, edge_data, user_id)
+        deleted = await self.repo.delete_edge(edge_data, user_id)
+        if deleted:
+            await self._bump_graph_version(user_id)
+        return deleted
 
-    async def execute_ai_action(self, action_key: str, selected_node_ids: list[UUID], user_id: str) -> Graph:
+    async def execute_ai_action(self, action_key: str, selected_node_ids: list[str], user_id: str) -> Graph:
         if not selected_node_ids:
             return Graph(nodes=[], edges=[])
 
-        source_nodes = [node for node in await asyncio.gather(
-            *[self._with_retry(self.repo.get_node_by_id, node_id, user_id) for node_id in selected_node_ids]
-        ) if node is not None]
+        source_nodes = await self.repo.get_nodes_by_ids(selected_node_ids, user_id)
 
         if not source_nodes:
             raise NodeNotFoundException("None of the selected nodes were found.")
 
-        await asyncio.gather(*[self._ensure_embedding(node) for node in source_nodes])
-
-        # Gather context from all source nodes
-        unique_neighbors = {}
-        unique_semantic_nodes = {}
-        excluded_ids = {n.id for n in source_nodes}
-
-        # Collect 1-hop neighbors for all source nodes
-        neighbor_tasks = [self._with_retry(self.repo.get_1_hop_neighbors, node.id, user_id) for node in source_nodes]
-        for neighbors in await asyncio.gather(*neighbor_tasks):
-            for neighbor in neighbors:
-                if neighbor.id not in excluded_ids:
-                    unique_neighbors[neighbor.id] = neighbor
-        
-        excluded_ids.update(unique_neighbors.keys())
-
-        # Collect semantically similar nodes for all source nodes
-        semantic_tasks = [
-            self._with_retry(
-                self.repo.find_semantically_similar_nodes,
-                node.embedding, list(excluded_ids), user_id, SIMILARITY_THRESHOLD, MAX_SEMANTIC_CANDIDATES
-            ) for node in source_nodes if node.embedding
-        ]
-        for semantic_results in await asyncio.gather(*semantic_tasks):
-            for node in semantic_results:
-                if node.id not in excluded_ids:
-                    unique_semantic_nodes[node.id] = node
-
-        final_context_nodes = list(unique_neighbors.values()) + list(unique_semantic_nodes.values())
+        # Neighbors and similar nodes of every source node come back from a single query, already
+        # de-duplicated and without the source nodes themselves. If embedding fails, the action
+        # still runs with the neighbors as its only context.
+        try:
+            await self._ensure_embeddings(source_nodes)
+        except Exception as e:
+            logger.warning("Embedding source nodes failed; skipping semantic context: %s", e)
+        # Semantic matches rank after every neighbor in the prompt, so fetching more than fit
+        # in it is wasted work.
+        structural_nodes, semantic_nodes = await self.repo.get_selection_context(
+            {node.id: node.embedding for node in source_nodes},
+            user_id, SIMILARITY_THRESHOLD, min(MAX_SEMANTIC_CANDIDATES, MAX_CONTEXT_NODES)
+        )
+        final_context_nodes = structural_nodes + semantic_nodes
         
         context_str = ""
         if final_context_nodes:
-            context_items = "\n".join([f"- {n.name}: {n.description}" for n in final_context_nodes])
+            context_items = "\n".join(
+                f"- {n.name}: {n.description[:MAX_DESC_CHARS]}"
+                for n in final_context_nodes[:MAX_CONTEXT_NODES]
+            )
             context_str = (
                 "To avoid creating duplicate concepts, be aware of these "
                 "semantically similar or directly related concepts that already exist in the graph:\n"
@@ -113,25 +152,35 @@ class GraphService:
         if not new_nodes and not new_edges:
             return Graph(nodes=[], edges=[])
 
-        for node in new_nodes:
-            node.userId = user_id
-        await asyncio.gather(*[self._ensure_embedding(node) for node in new_nodes])
+        await self._ensure_embeddings(new_nodes)
         
-        await self._with_retry(self.repo.add_subgraph, new_nodes, new_edges)
+        await self.repo.add_subgraph(new_nodes, new_edges, user_id)
+        await self._bump_graph_version(user_id)
 
         return Graph(nodes=new_nodes, edges=new_edges)
 
+    async def _bump_graph_version(self, user_id: str) -> None:
+        # Never reset the counter (not even on clear_workspace) so an old ETag can never match again.
+        # The Neo4j write has already committed, so a failed bump only costs cache freshness: failing
+        # the request here would invite the client to retry a write that succeeded.
+        try:
+            await get_redis_client().hincrby(
+                WORKSPACE_KEY_TEMPLATE.format(user_id=user_id), WORKSPACE_VERSION_FIELD, 1
+            )
+        except (RedisError, OSError) as exc:
+            logger.warning("Workspace version bump failed for %s: %s", user_id, exc)
+
     async def _ensure_embedding(self, node: Node) -> Node:
         if not node.embedding:
-            embedding_text = _get_embedding_text_for_node(node)
-            node.embedding = await self.embedding_service.get_embedding(embedding_text)
+            node.embedding = await self.embedding_service.get_embedding(node.embedding_text)
         return node
 
-    async def _with_retry(self, func, *args, retries: int = 3, delay: float = 0.5, **kwargs):
-        for attempt in range(retries):
-            try:
-                return await func(*args, **kwargs)
-            except (SessionExpired, ServiceUnavailable):
-                if attempt + 1 == retries:
-                    raise
-                await asyncio.sleep(delay * (attempt + 1))
\ No newline at end of file
+    async def _ensure_embeddings(self, nodes: list[Node]) -> list[Node]:
+        """Fills in every missing embedding with a single batched embedding request."""
+        missing = [node for node in nodes if not node.embedding]
+        embeddings = await self.embedding_service.get_embeddings(
+            [node.embedding_text for node in missing]
+        )
+        for node, embedding in zip(missing, embeddings):
+            node.embedding = embedding
+        return nodes
@@ -1,9 +1,21 @@
 # app/services/prompt_service.py
 import asyncio
-import json
+import os
+import sys
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
+import orjson
 from app.core.prompts import DEFAULT_PROMPTS
+from app.core.cache import TTLCache
+
+# Resolved prompts are served from memory; other workers see an update within the TTL.
+PROMPT_CACHE_MAXSIZE = 4096
+PROMPT_CACHE_TTL_SECONDS = 60
+# Parsed per-user stores, revalidated against the file's mtime and size on every read, so the
+# TTL only bounds how long an idle user's store stays in memory.
+STORE_CACHE_MAXSIZE = 1024
+STORE_CACHE_TTL_SECONDS = 60 * 60
 
 class PromptService:
     def __init__(self, store_path: Path | None = None):
@@ -11,6 +23,9 @@ class PromptService:
         self.store_dir = store_path or base_dir / "data"
         self.store_dir.mkdir(parents=True, exist_ok=True)
         self._lock = asyncio.Lock()
+        self._cache = TTLCache(maxsize=PROMPT_CACHE_MAXSIZE, ttl=PROMPT_CACHE_TTL_SECONDS)
+        self._stores = TTLCache(maxsize=STORE_CACHE_MAXSIZE, ttl=STORE_CACHE_TTL_SECONDS)
+        self._write_counts: dict[str, int] = {}
 
     def _get_user_store_path(self, user_id: str) -> Path:
         # Sanitize user_id for filename safety, although UUIDs are generally safe.
@@ -18,58 +33,107 @@ class PromptService:
         return self.store_dir / f"prompts_{safe_filename}.json"
 
     async def get_prompt(self, key: str, user_id: str) -> str:
-        normalized_key = self._normalize_key(key)
-        async with self._lock:
-            data = await self._read_store(user_id)
+        normalized_key = self.normalize_key(key)
+        cache_key = (user_id, normalized_key)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+        # Reads take no lock: writes replace the file atomically. A read that overlapped a write
+        # may return the old prompt but does not cache it over the writer's entry.
+        write_count = self._write_counts.get(user_id, 0)
+        data = await self._read_store(user_id)
         if normalized_key in data:
-            return data[normalized_key]
-        if normalized_key in DEFAULT_PROMPTS:
-            return DEFAULT_PROMPTS[normalized_key]
-        raise KeyError(f"Prompt '{key}' not found.")
+            prompt = data[normalized_key]
+        elif normalized_key in DEFAULT_PROMPTS:
+            prompt = DEFAULT_PROMPTS[normalized_key]
+        else:
+            raise KeyError(f"Prompt '{key}' not found.")
+        if self._write_counts.get(user_id, 0) == write_count:
+            self._cache.set(cache_key, prompt)
+        return prompt
 
     async def upsert_prompt(self, key: str, prompt_text: str, user_id: str) -> str:
-        normalized_key = self._normalize_key(key)
+        normalized_key = self.normalize_key(key)
         sanitized_prompt = prompt_text.strip()
         if not sanitized_prompt:
             raise ValueError("Prompt text cannot be empty.")
         async with self._lock:
-            data = await self._read_store(user_id)
+            # Copy, so the cached store is untouched if the write fails.
+            data = dict(await self._read_store(user_id))
             if normalized_key not in DEFAULT_PROMPTS and normalized_key not in data:
                 raise KeyError(f"Prompt '{key}' not found.")
             data[normalized_key] = sanitized_prompt
             await self._write_store(data, user_id)
+            self._cache.set((user_id, normalized_key), sanitized_prompt)
         return sanitized_prompt
 
     async def reset_prompt(self, key: str, user_id: str) -> str:
-        normalized_key = self._normalize_key(key)
+        normalized_key = self.normalize_key(key)
         if normalized_key not in DEFAULT_PROMPTS:
             raise KeyError(f"Prompt '{key}' not found.")
         default_prompt = DEFAULT_PROMPTS[normalized_key]
         async with self._lock:
-            data = await self._read_store(user_id)
+            data = dict(await self._read_store(user_id))
             data[normalized_key] = default_prompt
             await self._write_store(data, user_id)
+            self._cache.set((user_id, normalized_key), default_prompt)
         return default_prompt
 
     async def _read_store(self, user_id: str) -> dict[str, str]:
+        """Returns the user's parsed store; callers must not mutate it."""
         store_path = self._get_user_store_path(user_id)
-        if not store_path.exists():
+        try:
+            version = await asyncio.to_thread(self._file_version, store_path)
+        except FileNotFoundError:
+            self._stores.pop(user_id)
             return {}
+        cached = self._stores.get(user_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
         def _read() -> dict[str, Any]:
-            with store_path.open("r", encoding="utf-8") as handle:
-                return json.load(handle)
-        return await asyncio.to_thread(_read)
+            return orjson.loads(store_path.read_bytes())
+        # A change between the stat and the read only costs one extra reload on the next call.
+        data = await asyncio.to_thread(_read)
+        self._stores.set(user_id, (version, data))
+        return data
 
     async def _write_store(self, data: dict[str, str], user_id: str) -> None:
         store_path = self._get_user_store_path(user_id)
-        def _write() -> None:
-            with store_path.open("w", encoding="utf-8") as handle:
-                json.dump(data, handle, ensure_ascii=False, indent=2)
-        await asyncio.to_thread(_write)
+        self._write_counts[user_id] = self._write_counts.get(user_id, 0) + 1
+        def _write() -> tuple[int, int]:
+            # Write a sibling file and rename it over the store, so readers (and a restart after a
+            # crash) only ever see a complete store. The pid keeps workers' temp files apart.
+            tmp_path = store_path.with_name(f"{store_path.name}.{os.getpid()}.tmp")
+            try:
+                with tmp_path.open("wb") as handle:
+                    handle.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+                    handle.flush()
+                    os.fsync(handle.fileno())
+                os.replace(tmp_path, store_path)
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                raise
+            return self._file_version(store_path)
+        self._stores.set(user_id, (await asyncio.to_thread(_write), data))
+
+    @staticmethod
+    def _file_version(path: Path) -> tuple[int, int]:
+        stat = path.stat()
+        return stat.st_mtime_ns, stat.st_size
 
     def normalize_key(self, key: str) -> str:
-        return self._normalize_key(key)
+        return _NORMALIZED_DEFAULT_KEYS.get(key) or self._normalize_key(key)
 
     @staticmethod
+    @lru_cache(maxsize=256)
     def _normalize_key(key: str) -> str:
-        return key.strip().lower().replace(" ", "-").replace("_", "-")
\ No newline at end of file
+        # Clients reuse a handful of spellings ("Expand_Node", ...); memoize them. The bound
+        # keeps arbitrary keys from growing the cache.
+        return key.strip().lower().replace(" ", "-").replace("_", "-")
+
+
+# Most requests use one of the default keys verbatim, so resolve those with a single dict lookup.
+# DEFAULT_PROMPTS is itself keyed by normalized, interned keys (app/core/prompts.py).
+_NORMALIZED_DEFAULT_KEYS = {
+    key: sys.intern(PromptService._normalize_key(key)) for key in DEFAULT_PROMPTS
+}
@@ -0,0 +1,124 @@
+# app/services/task_service.py
+import asyncio
+import logging
+import time
+from contextlib import suppress
+from collections.abc import AsyncIterator
+from uuid import uuid4
+import orjson
+from app.core.exceptions import NodeNotFoundException
+from app.core.redis_client import get_redis_client
+from app.db.session import detached_context
+from app.services.graph_service import GraphService
+
+logger = logging.getLogger(__name__)
+
+# Each task publishes its progress to its own Redis stream, scoped to the submitting user.
+TASK_STREAM_KEY_TEMPLATE = "task:{user_id}:{task_id}"
+TASK_STREAM_TTL_SECONDS = 60 * 60
+STREAM_BLOCK_MS = 15_000
+# A task that has published nothing terminal by then is treated as lost (e.g. its worker restarted).
+STREAM_MAX_WAIT_SECONDS = 10 * 60
+TERMINAL_STATUSES = frozenset({"completed", "failed"})
+EMPTY_RESULT_DETAIL = "AI failed to generate a valid graph modification."
+
+class ActionTaskService:
+    """
+    Runs AI actions in the background so the submitting request returns immediately.
+    Progress events (pending -> completed | failed) are appended to a Redis stream that
+    any worker can relay to the client over SSE.
+    """
+
+    def __init__(self):
+        # Strong references so running tasks are not garbage collected mid-flight.
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, service: GraphService, action_key: str, selected_node_ids: list[str], user_id: str) -> str:
+        task_id = str(uuid4())
+        stream_key = TASK_STREAM_KEY_TEMPLATE.format(user_id=user_id, task_id=task_id)
+        # Publish before returning so the stream endpoint can tell a queued task from an unknown one.
+        await self._publish(stream_key, "pending", b"{}")
+        # The task outlives the request, so it must not borrow the request's Neo4j sessions.
+        task = asyncio.create_task(
+            self._run(stream_key, service, action_key, selected_node_ids, user_id),
+            context=detached_context()
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task_id
+
+    async def shutdown(self) -> None:
+        """Cancels in-flight tasks and waits for them to finish; called before Redis is closed."""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def task_exists(self, task_id: str, user_id: str) -> bool:
+        stream_key = TASK_STREAM_KEY_TEMPLATE.format(user_id=user_id, task_id=task_id)
+        return bool(await get_redis_client().exists(stream_key))
+
+    async def stream_events(self, task_id: str, user_id: str, last_event_id: str | None = None) -> AsyncIterator[str]:
+        """Yields the task's events as SSE frames until it reaches a terminal status."""
+        redis = get_redis_client()
+        stream_key = TASK_STREAM_KEY_TEMPLATE.format(user_id=user_id, task_id=task_id)
+        cursor = last_event_id or "0-0"
+        deadline = time.monotonic() + STREAM_MAX_WAIT_SECONDS
+        while True:
+            entries = await redis.xread({stream_key: cursor}, block=STREAM_BLOCK_MS)
+            if not entries:
+                # xread blocks forever on an expired stream, and a lost task never publishes a
+                # terminal event, so both end the stream with a synthetic failure.
+                if not await redis.exists(stream_key):
+                    yield _failure_frame(410, "The task has expired.")
+                    return
+                if time.monotonic() >= deadline:
+                    yield _failure_frame(504, "The task did not finish in time.")
+                    return
+                # Comment frame keeps proxies from closing an idle connection.
+                yield ": keepalive\n\n"
+                continue
+            for _, messages in entries:
+                for message_id, fields in messages:
+                    cursor = message_id
+                    yield f"id: {message_id}\nevent: {fields['status']}\ndata: {fields['data']}\n\n"
+                    if fields["status"] in TERMINAL_STATUSES:
+                        return
+
+    async def _run(self, stream_key: str, service: GraphService, action_key: str, selected_node_ids: list[str], user_id: str) -> None:
+        try:
+            created_graph = await service.execute_ai_action(action_key, selected_node_ids, user_id)
+        except asyncio.CancelledError:
+            # Shutdown: tell any listener now instead of letting it wait out the deadline.
+            with suppress(Exception):
+                await self._publish_failure(stream_key, 503, "The action was interrupted.")
+            raise
+        except NodeNotFoundException as e:
+            await self._publish_failure(stream_key, 404, e.message)
+            return
+        except Exception:
+            logger.exception("Background action failed for %s", stream_key)
+            await self._publish_failure(stream_key, 500, "The action could not be completed.")
+            return
+
+        if not created_graph.nodes and not created_graph.edges:
+            await self._publish_failure(stream_key, 500, EMPTY_RESULT_DETAIL)
+            return
+        await self._publish(stream_key, "completed", created_graph.model_dump_json())
+
+    async def _publish_failure(self, stream_key: str, status_code: int, detail: str) -> None:
+        await self._publish(stream_key, "failed", _failure_data(status_code, detail))
+
+    @staticmethod
+    async def _publish(stream_key: str, status: str, data: bytes | str) -> None:
+        async with get_redis_client().pipeline(transaction=True) as pipe:
+            pipe.xadd(stream_key, {"status": status, "data": data})
+            pipe.expire(stream_key, TASK_STREAM_TTL_SECONDS)
+            await pipe.execute()
+
+def _failure_data(status_code: int, detail: str) -> bytes:
+    return orjson.dumps({"status_code": status_code, "detail": detail})
+
+def _failure_frame(status_code: int, detail: str) -> str:
+    """A failed event that was never stored in the stream, so it carries no id to resume from."""
+    return f"event: failed\ndata: {_failure_data(status_code, detail).decode()}\n\n"
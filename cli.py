@@ -2,32 +2,20 @@ import asyncio
 import json
 import subprocess
 from typing import List
-from uuid import UUID
 
 import typer
 from rich.console import Console
 from rich.syntax import Syntax
 
-from app.models.graph import Node
-from app.services.ai_service import AIService
-from app.core.config import settings
+from app.core.config import get_settings
 from app.db.driver import Neo4jDriver
 from app.db.repositories.graph_repository import GraphRepository
-from app.services.embedding_service import EmbeddingService
-from app.core.rag_config import SIMILARITY_THRESHOLD, MAX_SEMANTIC_CANDIDATES
+from app.services.dependencies import get_ai_service, get_embedding_service
+from app.core.rag_config import SIMILARITY_THRESHOLD, MAX_SEMANTIC_CANDIDATES, MAX_CONTEXT_NODES
 
 cli_app = typer.Typer()
 console = Console()
 
-def _get_embedding_text_for_node(node: Node) -> str:
-    """Creates a rich, consistent text document for embedding."""
-    galaxies_str = ", ".join(node.galaxies) if node.galaxies else "None"
-    return (
-        f"Concept Name: {node.name}\n"
-        f"Description: {node.description}\n"
-        f"Galaxies: {galaxies_str}"
-    )
-
 @cli_app.command()
 def tune_prompt(
     name: str = typer.Option(..., "--name", "-n", help="The name of the concept node."),
@@ -43,11 +31,13 @@ def tune_prompt(
 
 @cli_app.command()
 def test_expand(
-    node_id: UUID = typer.Option(..., "--node-id", "-n", help="The UUID of the node to expand."),
+    node_id: str = typer.Option(..., "--node-id", "-n", help="The UUID of the node to expand."),
+    user_id: str = typer.Option(..., "--user-id", "-u", help="The workspace (X-User-ID) the node belongs to."),
 ):
     """
     Tests the full expansion orchestration using the Neo4j vector index.
     """
+    settings = get_settings()
     if not settings.GEMINI_API_KEY:
         console.print("[bold red]Error:[/bold red] GEMINI_API_KEY is not set in your .env file.")
         raise typer.Exit(code=1)
@@ -56,54 +46,53 @@ def test_expand(
         driver = await Neo4jDriver.get_driver()
         repo = GraphRepository(driver)
         
-        source_node = await repo.get_node_by_id(node_id)
+        source_node = await repo.get_node_by_id(node_id, user_id)
         if not source_node:
             console.print(f"[bold red]Error:[/bold red] Node with ID {node_id} not found.")
             return
 
         console.print(f"[cyan]--- Testing Retrieval from Persistent Vector Index ---[/cyan]")
         
-        embedding_service = EmbeddingService(api_key=settings.GEMINI_API_KEY)
-        if not source_node.embedding:
+        embedding_service = get_embedding_service()
+        # The repository caches source_node, so the embedding is kept locally instead of set on it.
+        query_vector = source_node.embedding
+        if not query_vector:
             console.print("[yellow]Warning: Source node missing embedding. Generating one for this test.[/yellow]")
-            source_node.embedding = await embedding_service.get_embedding(
-                _get_embedding_text_for_node(source_node)
-            )
-
-        # 1. Structural Retrieval
-        structural_nodes = await repo.get_1_hop_neighbors(node_id)
-        console.print(f"[cyan]Found {len(structural_nodes)} direct neighbors (structural search).[/cyan]")
-
-        # 2. Semantic Retrieval from Neo4j
-        excluded_ids = {n.id for n in structural_nodes}
-        excluded_ids.add(source_node.id)
-        
-        semantic_nodes = await repo.find_semantically_similar_nodes(
-            query_vector=source_node.embedding,
-            excluded_node_ids=list(excluded_ids),
+            query_vector = await embedding_service.get_embedding(source_node.embedding_text)
+
+        # 1. Structural and semantic retrieval in one query; direct neighbors are
+        # already excluded from the semantic results server-side.
+        structural_nodes, semantic_nodes = await repo.get_expansion_context(
+            node_id=node_id,
+            query_vector=query_vector,
+            user_id=user_id,
             threshold=SIMILARITY_THRESHOLD,
             limit=MAX_SEMANTIC_CANDIDATES
         )
+        console.print(f"[cyan]Found {len(structural_nodes)} direct neighbors (structural search).[/cyan]")
         console.print(f"[cyan]Found {len(semantic_nodes)} relevant nodes from vector index (semantic search).[/cyan]")
 
-        # 3. Combine and Format
+        # 2. Combine and Format
         final_context_nodes = structural_nodes + semantic_nodes
         
-        context_str = "[yellow]No context nodes found.[/yellow]"
+        context_str = ""
         if final_context_nodes:
-            context_items = "\n".join([f"- {n.name}" for n in final_context_nodes])
+            context_items = "\n".join(f"- {n.name}" for n in final_context_nodes[:MAX_CONTEXT_NODES])
             context_str = (
                 "To avoid creating duplicate concepts, be aware of these "
                 "semantically similar or directly related concepts that already exist in the graph:\n"
-                f"[yellow]{context_items}[/yellow]"
+                f"{context_items}"
             )
         
         console.print("\n[bold green]CONTEXT FOR PROMPT:[/bold green]")
-        console.print(context_str)
+        # Printed as plain text so the context the model receives carries no console markup.
+        console.print(context_str or "No context nodes found.", style="yellow", markup=False)
 
         console.print("\n[cyan]Querying AI with context...[/cyan]")
-        ai_service = AIService(api_key=settings.GEMINI_API_KEY)
-        new_nodes, new_edges = await ai_service.generate_expansion(source_node, context=context_str)
+        ai_service = get_ai_service()
+        new_nodes, new_edges = await ai_service.generate_graph_modification(
+            [source_node], user_id, "expand-node", context=context_str
+        )
 
         console.print("\n[bold green]AI Generated Nodes:[/bold green]")
         nodes_json = json.dumps([node.model_dump(mode='json') for node in new_nodes], indent=2)
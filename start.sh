@@ -27,5 +27,6 @@ until redis-cli -h "$REDIS_HOST" -p "$REDIS_PORT" ping >/dev/null 2>&1; do
 done
 echo "Redis is ready."
 
-# Start the Uvicorn server in the foreground
-uvicorn app.main:app --host 0.0.0.0 --port "${PORT:-8000}"
+# Start the Uvicorn server in the foreground. uvloop and httptools ship with fastapi[all];
+# naming them makes a missing install fail at startup instead of falling back to asyncio/h11.
+uvicorn app.main:app --host 0.0.0.0 --port "${PORT:-8000}" --loop uvloop --http httptools
@@ -1,7 +1,7 @@
 import pytest
 from json import JSONDecodeError
 
-from app.services.ai_response_parser import parse_ai_response_text
+from app.services.ai_response_parser import _remove_forbidden_fields, parse_ai_response_text
 
 
 def test_parses_code_fenced_json():
@@ -39,3 +39,12 @@ def test_drops_thought_signature():
 def test_empty_payload_raises_json_error():
     with pytest.raises(JSONDecodeError):
         parse_ai_response_text("")
+
+
+def test_drops_nested_thought_fields_and_keeps_clean_payload_identity():
+    raw = '{"nodes": [{"name": "A", "thoughts": ["x"]}], "edges": []}'
+    parsed = parse_ai_response_text(raw)
+    assert parsed == {"nodes": [{"name": "A"}], "edges": []}
+
+    clean = {"nodes": [{"name": "A"}], "edges": []}
+    assert _remove_forbidden_fields(clean) is clean
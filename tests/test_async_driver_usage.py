@@ -0,0 +1,32 @@
+import re
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+SYNC_DRIVER_RE = re.compile(r"(?<!Async)GraphDatabase\.driver\(")
+RUN_CALL_RE = re.compile(r"\b(session|tx)\.run\(")
+
+
+def _app_sources():
+    for path in APP_DIR.rglob("*.py"):
+        yield path, path.read_text(encoding="utf-8").splitlines()
+
+
+def test_app_never_builds_a_sync_neo4j_driver():
+    offenders = [
+        f"{path.relative_to(APP_DIR)}:{lineno}"
+        for path, lines in _app_sources()
+        for lineno, line in enumerate(lines, start=1)
+        if SYNC_DRIVER_RE.search(line)
+    ]
+    assert offenders == []
+
+
+def test_every_cypher_run_is_awaited():
+    # A sync session.run() would block the event loop and serialize every request.
+    offenders = [
+        f"{path.relative_to(APP_DIR)}:{lineno}"
+        for path, lines in _app_sources()
+        for lineno, line in enumerate(lines, start=1)
+        if RUN_CALL_RE.search(line) and "await" not in line
+    ]
+    assert offenders == []
@@ -0,0 +1,32 @@
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.testclient import TestClient
+
+from app.main import app, allowed_origins
+
+
+def test_cors_uses_an_explicit_origin_list():
+    cors = next(m for m in app.user_middleware if m.cls is CORSMiddleware)
+    assert "*" not in cors.kwargs["allow_origins"]
+    assert cors.kwargs["allow_origins"] == allowed_origins
+
+
+def test_cors_echoes_only_allowed_origins():
+    client = TestClient(app)
+
+    allowed = client.get("/", headers={"Origin": "https://jonasbuffington.github.io"})
+    assert allowed.headers["access-control-allow-origin"] == "https://jonasbuffington.github.io"
+
+    rejected = client.get("/", headers={"Origin": "https://evil.example"})
+    assert "access-control-allow-origin" not in rejected.headers
+
+
+def test_preflight_is_answered_by_cors_and_cached():
+    client = TestClient(app)
+
+    preflight = client.options("/graph/execute-action", headers={
+        "Origin": "https://jonasbuffington.github.io",
+        "Access-Control-Request-Method": "POST",
+        "Access-Control-Request-Headers": "X-User-ID, Content-Type",
+    })
+    assert preflight.status_code == 200
+    assert preflight.headers["access-control-max-age"] == "7200"
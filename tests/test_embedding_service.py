@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+from app.services import embedding_service as embedding_service_module
+from app.services.embedding_service import EmbeddingService
+
+
+class StubPipeline:
+    def __init__(self, redis_client: "StubBinaryRedis"):
+        self.redis_client = redis_client
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def set(self, key, value, ex=None):
+        self.redis_client.values[key] = value
+
+    async def execute(self):
+        return []
+
+
+class StubBinaryRedis:
+    def __init__(self):
+        self.values: dict[str, bytes] = {}
+
+    async def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def pipeline(self, transaction: bool = True):
+        return StubPipeline(self)
+
+
+@pytest.mark.asyncio
+async def test_batch_embeddings_only_fetch_uncached_texts(monkeypatch):
+    redis_client = StubBinaryRedis()
+    monkeypatch.setattr(embedding_service_module, "get_binary_redis_client", lambda: redis_client)
+    service = EmbeddingService(api_key="test-key")
+    fetched: list[list[str]] = []
+
+    async def fake_fetch(texts):
+        fetched.append(texts)
+        return [[0.5, float(len(text))] for text in texts]
+
+    monkeypatch.setattr(service, "_fetch_embeddings", fake_fetch)
+
+    assert await service.get_embeddings(["a", "bb"]) == [[0.5, 1.0], [0.5, 2.0]]
+    assert await service.get_embeddings(["bb", "ccc"]) == [[0.5, 2.0], [0.5, 3.0]]
+    assert fetched == [["a", "bb"], ["ccc"]]
+
+
+@pytest.mark.asyncio
+async def test_large_batches_are_split_per_api_request(monkeypatch):
+    monkeypatch.setattr(embedding_service_module, "get_binary_redis_client", lambda: StubBinaryRedis())
+    service = EmbeddingService(api_key="test-key")
+    batch_sizes: list[int] = []
+
+    async def fake_fetch(texts):
+        batch_sizes.append(len(texts))
+        return [[float(text)] for text in texts]
+
+    monkeypatch.setattr(service, "_fetch_embeddings", fake_fetch)
+
+    texts = [str(i) for i in range(250)]
+    assert await service.get_embeddings(texts) == [[float(i)] for i in range(250)]
+    assert batch_sizes == [100, 100, 50]
+
+
+def test_each_worker_thread_gets_its_own_http_session():
+    service = EmbeddingService(api_key="test-key")
+    sessions = []
+    worker = threading.Thread(target=lambda: sessions.append(service._session()))
+    worker.start()
+    worker.join()
+
+    assert service._session() is service._session()
+    assert sessions[0] is not service._session()
+    assert service._session().headers["x-goog-api-key"] == "test-key"
+
+
+@pytest.mark.asyncio
+async def test_fresh_and_cached_embeddings_are_identical(monkeypatch):
+    redis_client = StubBinaryRedis()
+    monkeypatch.setattr(embedding_service_module, "get_binary_redis_client", lambda: redis_client)
+    service = EmbeddingService(api_key="test-key")
+    fetched: list[list[str]] = []
+
+    async def fake_fetch(texts):
+        fetched.append(texts)
+        return [[0.1, 1 / 3] for _ in texts]
+
+    monkeypatch.setattr(service, "_fetch_embeddings", fake_fetch)
+
+    fresh = await service.get_embeddings(["a"])
+    assert fresh != [[0.1, 1 / 3]]
+    assert await service.get_embeddings(["a"]) == fresh
+    assert fetched == [["a"]]
@@ -0,0 +1,17 @@
+from app.models.graph import Graph, Node
+
+
+def test_embeddings_are_kept_in_memory_but_never_serialized():
+    node = Node(name="Logic", description="Reasoning.", embedding=[0.1, 0.2], userId="user-1")
+
+    assert node.embedding == [0.1, 0.2]
+    assert "embedding" not in node.model_dump()
+    assert '"embedding"' not in Graph(nodes=[node], edges=[]).model_dump_json()
+
+
+def test_embedding_text_is_computed_once_and_not_serialized():
+    node = Node(name="Logic", description="Reasoning.")
+
+    assert node.embedding_text == "Concept Name: Logic\nDescription: Reasoning."
+    assert node.embedding_text is node.embedding_text
+    assert "embedding_text" not in node.model_dump()
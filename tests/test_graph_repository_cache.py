@@ -0,0 +1,94 @@
+import pytest
+from neo4j import EagerResult
+from neo4j.exceptions import ServiceUnavailable
+
+from app.db.repositories.graph_repository import GraphRepository
+from app.models.graph import Edge
+
+NODE_ID = "3f2b8c1e-2d4a-4b6f-9a1c-5e7d9f0b1c2d"
+
+
+NODE_RECORD = {"n": {"id": NODE_ID, "name": "Logic", "description": "Reasoning.", "userId": "user-1"}}
+
+
+class StubDriver:
+    def __init__(self):
+        self.queries: list[str] = []
+
+    async def execute_query(self, query, parameters=None, routing_=None):
+        self.queries.append(query)
+        return EagerResult([NODE_RECORD], None, ["n"])
+
+
+@pytest.mark.asyncio
+async def test_node_reads_are_cached_until_the_workspace_changes():
+    driver = StubDriver()
+    repo = GraphRepository(driver)
+
+    first = await repo.get_node_by_id(NODE_ID, "user-1")
+    second = await repo.get_node_by_id(NODE_ID, "user-1")
+    assert first is second
+    assert len(driver.queries) == 1
+
+    repo._invalidate("user-1")
+    await repo.get_node_by_id(NODE_ID, "user-1")
+    assert len(driver.queries) == 2
+
+    # Other workspaces are unaffected by the invalidation.
+    await repo.get_node_by_id(NODE_ID, "user-2")
+    await repo.get_node_by_id(NODE_ID, "user-2")
+    assert len(driver.queries) == 3
+
+
+
+@pytest.mark.asyncio
+async def test_forgotten_generations_never_revive_stale_entries():
+    driver = StubDriver()
+    repo = GraphRepository(driver)
+    await repo.get_node_by_id(NODE_ID, "user-1")
+
+    # Losing the user's generation (TTL or LRU eviction) must behave like an invalidation.
+    repo._generations.clear()
+    await repo.get_node_by_id(NODE_ID, "user-1")
+    assert len(driver.queries) == 2
+
+class ShardSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute_write(self, work, nodes_payload, edges_payload, user_id):
+        if edges_payload and edges_payload[0]["source_id"] == self.driver.flaky_source:
+            self.driver.flaky_source = None
+            raise ServiceUnavailable("connection lost")
+        self.driver.writes.append((len(nodes_payload), len(edges_payload)))
+
+
+class ShardDriver:
+    def __init__(self, flaky_source):
+        self.flaky_source = flaky_source
+        self.writes: list[tuple[int, int]] = []
+
+    def session(self, default_access_mode=None):
+        return ShardSession(self)
+
+
+@pytest.mark.asyncio
+async def test_sharded_subgraph_failure_does_not_replay_committed_shards():
+    # 512 edges from 16 sources, one per leading hex digit: two sources per shard.
+    sources = [f"{digit:x}" + NODE_ID[1:] for digit in range(16)]
+    edges = [Edge(source_id=source, target_id=NODE_ID, label=f"L{i}") for source in sources for i in range(32)]
+    driver = ShardDriver(flaky_source=sources[0])
+
+    # execute_write has already used up its own retries when the error reaches the repository.
+    with pytest.raises(ServiceUnavailable):
+        await GraphRepository(driver).add_subgraph([], edges, "user-1")
+
+    # The node write and the seven healthy shards each committed exactly once.
+    assert driver.writes[0] == (0, 0)
+    assert sorted(driver.writes[1:]) == [(0, 64)] * 7
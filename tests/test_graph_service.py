@@ -0,0 +1,64 @@
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.models.graph import Node
+from app.services import graph_service as graph_service_module
+from app.services.graph_service import GraphService
+
+NODE_ID = "3f2b8c1e-2d4a-4b6f-9a1c-5e7d9f0b1c2d"
+
+
+class StubRepo:
+    def __init__(self):
+        self.query_vectors = None
+
+    async def get_nodes_by_ids(self, node_ids, user_id):
+        return [Node(id=NODE_ID, name="Logic", description="Reasoning.")]
+
+    async def get_selection_context(self, query_vectors, user_id, threshold, limit):
+        self.query_vectors = query_vectors
+        return [Node(name="Proof", description="A derivation.")], []
+
+
+class FailingEmbeddingService:
+    async def get_embeddings(self, texts):
+        raise RuntimeError("embedding API down")
+
+
+class RecordingAIService:
+    def __init__(self):
+        self.context = None
+
+    async def generate_graph_modification(self, source_nodes, user_id, prompt_key, context=""):
+        self.context = context
+        return [], []
+
+
+@pytest.mark.asyncio
+async def test_embedding_failure_falls_back_to_structural_context():
+    ai_service = RecordingAIService()
+    service = GraphService(driver=None, embedding_service=FailingEmbeddingService(), ai_service=ai_service)
+    service.repo = StubRepo()
+
+    await service.execute_ai_action("expand-node", [NODE_ID], "user-1")
+
+    assert service.repo.query_vectors == {NODE_ID: None}
+    assert "- Proof: A derivation." in ai_service.context
+
+
+class UnavailableRedis:
+    async def hget(self, key, field):
+        raise RedisConnectionError("redis down")
+
+    async def hincrby(self, key, field, amount):
+        raise RedisConnectionError("redis down")
+
+
+@pytest.mark.asyncio
+async def test_workspace_version_degrades_when_redis_is_down(monkeypatch):
+    monkeypatch.setattr(graph_service_module, "get_redis_client", lambda: UnavailableRedis())
+    service = GraphService(driver=None, embedding_service=FailingEmbeddingService(), ai_service=RecordingAIService())
+
+    assert await service.get_graph_version("user-1") is None
+    # The write already committed in Neo4j; the failed bump must not fail the request.
+    await service._bump_graph_version("user-1")
@@ -1,7 +1,8 @@
 import pytest
 from fastapi import HTTPException
+from fastapi.testclient import TestClient
 
-from app.main import redis_health_check, RedisClient
+from app.main import HEALTH_REVISION_VALUE, app, redis_health_check, RedisClient
 
 
 class DummyRedis:
@@ -36,3 +37,18 @@ async def test_redis_health_failure(monkeypatch):
         await redis_health_check()
 
     assert "Redis unavailable" in str(exc.value.detail)
+
+
+def test_head_probe_is_answered_before_routing():
+    client = TestClient(app)
+
+    probe = client.head("/healthz")
+    assert probe.status_code == 200
+    assert probe.headers["content-length"] == "15"
+
+    # Browser clients still go through the full route and its revision check.
+    expired = client.get("/healthz", headers={"Origin": "https://jonasbuffington.github.io"})
+    assert expired.status_code == 410
+
+    full = client.get("/healthz/full", headers={"X-App-Revision": HEALTH_REVISION_VALUE})
+    assert full.json()["polling_allowed"] is True
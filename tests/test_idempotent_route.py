@@ -5,18 +5,51 @@ from app.api import idempotency as idempotency_module
 from app.api.idempotency import IdempotentAPIRoute
 
 
+class StubAcquireScript:
+    def __init__(self, store: dict[str, str]):
+        self.store = store
+
+    async def __call__(self, keys=None, args=None, client=None):
+        cache_key, lock_key = keys
+        if cache_key in self.store:
+            return [1, self.store[cache_key]]
+        if lock_key in self.store:
+            return [2]
+        self.store[lock_key] = "1"
+        return [0]
+
+
+class StubPipeline:
+    def __init__(self, redis_client: "StubRedis"):
+        self.redis_client = redis_client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def set(self, key, value, ex=None):
+        self.commands.append(lambda: self.redis_client.store.__setitem__(key, value))
+
+    def delete(self, key):
+        self.commands.append(lambda: self.redis_client.store.pop(key, None))
+
+    async def execute(self):
+        for command in self.commands:
+            command()
+
+
 class StubRedis:
     def __init__(self):
         self.store: dict[str, str] = {}
 
-    async def get(self, key: str):
-        return self.store.get(key)
+    def register_script(self, script: str):
+        return StubAcquireScript(self.store)
 
-    async def set(self, key: str, value: str, ex: int | None = None, nx: bool = False):
-        if nx and key in self.store:
-            return False
-        self.store[key] = value
-        return True
+    def pipeline(self, transaction: bool = True):
+        return StubPipeline(self)
 
     async def delete(self, key: str):
         self.store.pop(key, None)
@@ -50,6 +83,40 @@ def test_idempotent_route_caches_response(monkeypatch):
     assert first.status_code == 200
     assert first.json() == payload
 
-    second = client.post("/echo", json={"value": "second"}, headers=HEADERS)
+    second = client.post("/echo", json=payload, headers=HEADERS)
     assert second.status_code == 200
     assert second.json() == payload
+    assert "idempotency:user-1:key-1:lock" not in redis_client.store
+
+
+def test_idempotent_route_rejects_key_reuse_with_a_different_body(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(idempotency_module, "get_redis_client", lambda: redis_client)
+
+    client = TestClient(build_app())
+
+    assert client.post("/echo", json={"value": "first"}, headers=HEADERS).status_code == 200
+    reused = client.post("/echo", json={"value": "second"}, headers=HEADERS)
+    assert reused.status_code == 422
+
+
+def test_idempotent_route_rejects_concurrent_request(monkeypatch):
+    redis_client = StubRedis()
+    redis_client.store["idempotency:user-1:key-1:lock"] = "1"
+    monkeypatch.setattr(idempotency_module, "get_redis_client", lambda: redis_client)
+
+    client = TestClient(build_app())
+
+    response = client.post("/echo", json={"value": "first"}, headers=HEADERS)
+    assert response.status_code == 409
+
+
+def test_idempotent_route_rejects_malformed_user_id_before_redis(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(idempotency_module, "get_redis_client", lambda: redis_client)
+
+    client = TestClient(build_app())
+
+    response = client.post("/echo", json={}, headers={**HEADERS, "X-User-ID": "user-1\n"})
+    assert response.status_code == 400
+    assert redis_client.store == {}
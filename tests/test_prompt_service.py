@@ -0,0 +1,43 @@
+import pytest
+
+from app.core.prompts import DEFAULT_PROMPTS
+from app.services.prompt_service import PromptService
+
+
+@pytest.mark.asyncio
+async def test_returns_default_prompt_for_normalized_key(tmp_path):
+    service = PromptService(store_path=tmp_path)
+    assert await service.get_prompt("Expand_Node", "user-1") == DEFAULT_PROMPTS["expand-node"]
+
+
+@pytest.mark.asyncio
+async def test_upsert_is_visible_to_following_reads(tmp_path):
+    service = PromptService(store_path=tmp_path)
+    await service.get_prompt("expand-node", "user-1")
+
+    await service.upsert_prompt("expand-node", "  custom prompt  ", "user-1")
+
+    assert await service.get_prompt("expand-node", "user-1") == "custom prompt"
+    assert await service.get_prompt("expand-node", "user-2") == DEFAULT_PROMPTS["expand-node"]
+    # A fresh instance reads the persisted store rather than another instance's cache.
+    assert await PromptService(store_path=tmp_path).get_prompt("expand-node", "user-1") == "custom prompt"
+
+
+@pytest.mark.asyncio
+async def test_unknown_prompt_raises_key_error(tmp_path):
+    service = PromptService(store_path=tmp_path)
+    with pytest.raises(KeyError):
+        await service.get_prompt("does-not-exist", "user-1")
+
+
+@pytest.mark.asyncio
+async def test_store_is_reparsed_only_when_the_file_changes(tmp_path):
+    service = PromptService(store_path=tmp_path)
+    await service.upsert_prompt("expand-node", "first", "user-1")
+    store = await service._read_store("user-1")
+    assert await service._read_store("user-1") is store
+
+    # Another worker rewrites the file; the size/mtime change invalidates the cached parse.
+    other = PromptService(store_path=tmp_path)
+    await other.upsert_prompt("expand-node", "second, longer", "user-1")
+    assert (await service._read_store("user-1"))["expand-node"] == "second, longer"
@@ -0,0 +1,81 @@
+import re
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import limiter as limiter_module
+from app.core.limiter import RateLimitMiddleware, RateLimitRule
+
+
+class StubScript:
+    def __init__(self, store: dict[str, int]):
+        self.store = store
+
+    async def __call__(self, keys=None, args=None, client=None):
+        key = keys[0]
+        self.store[key] = self.store.get(key, 0) + 1
+        return [self.store[key], int(args[0])]
+
+
+class StubRedis:
+    def __init__(self):
+        self.store: dict[str, int] = {}
+
+    def register_script(self, script: str):
+        return StubScript(self.store)
+
+
+RULES = (RateLimitRule("echo", "POST", re.compile(r"^/echo$"), 2),)
+
+
+def build_app():
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(payload: dict):
+        return payload
+
+    @app.get("/open")
+    async def open_route():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, rules=RULES)
+    return app
+
+
+def test_rejects_requests_over_the_limit(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(limiter_module, "get_limiter_storage", lambda: redis_client)
+    client = TestClient(build_app())
+
+    headers = {"X-User-ID": "user-1"}
+    assert client.post("/echo", json={}, headers=headers).status_code == 200
+    assert client.post("/echo", json={}, headers=headers).status_code == 200
+
+    third = client.post("/echo", json={}, headers=headers)
+    assert third.status_code == 429
+    assert third.json() == {"error": "Rate limit exceeded: 2 per 60 seconds"}
+    assert third.headers["retry-after"] == "60"
+
+    # Counters are tracked per user.
+    assert client.post("/echo", json={}, headers={"X-User-ID": "user-2"}).status_code == 200
+
+
+def test_unmatched_routes_bypass_the_limiter(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(limiter_module, "get_limiter_storage", lambda: redis_client)
+    client = TestClient(build_app())
+
+    for _ in range(5):
+        assert client.get("/open").status_code == 200
+    assert redis_client.store == {}
+
+
+def test_malformed_user_ids_are_limited_by_address(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(limiter_module, "get_limiter_storage", lambda: redis_client)
+    client = TestClient(build_app())
+
+    client.post("/echo", json={}, headers={"X-User-ID": "not a valid id"})
+    client.post("/echo", json={}, headers={"X-User-ID": "user-1\n"})
+    assert list(redis_client.store) == ["ratelimit:echo:testclient"]
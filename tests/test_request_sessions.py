@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+from neo4j import READ_ACCESS, RoutingControl
+from neo4j.exceptions import ServiceUnavailable
+from tenacity import wait_none
+
+from app.db import session as session_module
+from app.db.session import execute_query, open_session, request_session_scope
+
+
+class StubSession:
+    def __init__(self, access_mode, failures: int = 0):
+        self.access_mode = access_mode
+        self.closed = False
+        self.failures = failures
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+        return False
+
+    async def close(self):
+        self.closed = True
+
+    async def run(self, query, parameters=None):
+        if self.failures:
+            raise ServiceUnavailable("connection lost")
+        return StubResult(("session", query))
+
+
+class StubResult:
+    def __init__(self, value):
+        self.value = value
+
+    async def to_eager_result(self):
+        return self.value
+
+
+class StubDriver:
+    def __init__(self, failing_sessions: int = 0):
+        self.opened: list[StubSession] = []
+        self.failing_sessions = failing_sessions
+
+    def session(self, default_access_mode=None):
+        failing = len(self.opened) < self.failing_sessions
+        session = StubSession(default_access_mode, failures=int(failing))
+        self.opened.append(session)
+        return session
+
+    async def execute_query(self, query, parameters=None, routing_=None):
+        return ("driver", query, routing_)
+
+
+@pytest.mark.asyncio
+async def test_sequential_calls_share_one_session_per_access_mode():
+    driver = StubDriver()
+    async with request_session_scope(driver):
+        async with open_session(driver) as first:
+            pass
+        async with open_session(driver) as second:
+            pass
+        async with open_session(driver, READ_ACCESS) as read:
+            pass
+        assert first is second
+        assert read is not first
+        assert not first.closed
+    assert len(driver.opened) == 2
+    assert all(session.closed for session in driver.opened)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_fall_back_to_dedicated_sessions():
+    driver = StubDriver()
+
+    async def use_session():
+        async with open_session(driver) as session:
+            await asyncio.sleep(0)
+            return session
+
+    async with request_session_scope(driver):
+        first, second = await asyncio.gather(use_session(), use_session())
+    assert first is not second
+    assert len(driver.opened) == 2
+
+
+@pytest.mark.asyncio
+async def test_execute_query_uses_the_request_session_inside_a_scope():
+    driver = StubDriver()
+    assert await execute_query(driver, "RETURN 1", access_mode=READ_ACCESS) == ("driver", "RETURN 1", RoutingControl.READ)
+    assert driver.opened == []
+
+    async with request_session_scope(driver):
+        assert await execute_query(driver, "RETURN 1") == ("session", "RETURN 1")
+    assert len(driver.opened) == 1
+
+
+@pytest.mark.asyncio
+async def test_auto_commit_queries_are_retried_on_a_fresh_session(monkeypatch):
+    monkeypatch.setattr(session_module._run_in_scope.retry, "wait", wait_none())
+    driver = StubDriver(failing_sessions=2)
+
+    async with request_session_scope(driver):
+        assert await execute_query(driver, "RETURN 1") == ("session", "RETURN 1")
+    assert len(driver.opened) == 3
+    assert all(session.closed for session in driver.opened)
+
+    down = StubDriver(failing_sessions=3)
+    with pytest.raises(ServiceUnavailable):
+        async with request_session_scope(down):
+            await execute_query(down, "RETURN 1")
+    assert len(down.opened) == 3
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from app.models.graph import Graph, Node
+from app.services import task_service as task_service_module
+from app.services.task_service import ActionTaskService
+
+
+class StubPipeline:
+    def __init__(self, redis_client: "StubRedis"):
+        self.redis_client = redis_client
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def xadd(self, key, fields):
+        stream = self.redis_client.streams.setdefault(key, [])
+        stream.append((f"{len(stream) + 1}-0", {name: value.decode() if isinstance(value, bytes) else value for name, value in fields.items()}))
+
+    def expire(self, key, seconds):
+        pass
+
+    async def execute(self):
+        return []
+
+
+class StubRedis:
+    def __init__(self):
+        self.streams: dict[str, list] = {}
+
+    def pipeline(self, transaction: bool = True):
+        return StubPipeline(self)
+
+    async def exists(self, key):
+        return int(key in self.streams)
+
+    async def xread(self, streams, block=None):
+        (key, cursor), = streams.items()
+        seq = int(cursor.split("-")[0])
+        messages = self.streams.get(key, [])[seq:]
+        if not messages:
+            await asyncio.sleep(0)
+            return []
+        return [(key, messages)]
+
+
+class StubGraphService:
+    def __init__(self, result: Graph):
+        self.result = result
+
+    async def execute_ai_action(self, action_key, selected_node_ids, user_id):
+        return self.result
+
+
+@pytest.mark.asyncio
+async def test_stream_ends_with_completed_graph(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(task_service_module, "get_redis_client", lambda: redis_client)
+    graph = Graph(nodes=[Node(name="Photosynthesis", description="Light to energy.")], edges=[])
+
+    service = ActionTaskService()
+    task_id = await service.submit(StubGraphService(graph), "expand-node", [], "user-1")
+    assert await service.task_exists(task_id, "user-1")
+    assert not await service.task_exists(task_id, "user-2")
+
+    frames = [frame async for frame in service.stream_events(task_id, "user-1")]
+    events = [frame for frame in frames if frame.startswith("id:")]
+    assert events[0].startswith("id: 1-0\nevent: pending\n")
+    assert "event: completed\n" in events[-1]
+    assert "Photosynthesis" in events[-1]
+
+
+@pytest.mark.asyncio
+async def test_empty_result_is_reported_as_failure(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(task_service_module, "get_redis_client", lambda: redis_client)
+
+    service = ActionTaskService()
+    task_id = await service.submit(StubGraphService(Graph(nodes=[], edges=[])), "expand-node", [], "user-1")
+
+    frames = [frame async for frame in service.stream_events(task_id, "user-1")]
+    assert "event: failed\n" in frames[-1]
+    assert '"status_code":500' in frames[-1]
+
+
+@pytest.mark.asyncio
+async def test_stream_ends_when_the_task_is_expired_or_lost(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(task_service_module, "get_redis_client", lambda: redis_client)
+    service = ActionTaskService()
+
+    expired = [frame async for frame in service.stream_events("missing", "user-1")]
+    assert expired[-1].startswith("event: failed\n")
+    assert '"status_code":410' in expired[-1]
+
+    # A pending event with nobody left to finish the task runs into the deadline.
+    await service._publish("task:user-1:lost", "pending", b"{}")
+    monkeypatch.setattr(task_service_module, "STREAM_MAX_WAIT_SECONDS", 0)
+    lost = [frame async for frame in service.stream_events("lost", "user-1")]
+    assert "event: pending\n" in lost[0]
+    assert '"status_code":504' in lost[-1]
+
+
+class BlockingGraphService:
+    async def execute_ai_action(self, action_key, selected_node_ids, user_id):
+        await asyncio.Event().wait()
+
+
+@pytest.mark.asyncio
+async def test_shutdown_cancels_running_tasks_and_reports_them(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(task_service_module, "get_redis_client", lambda: redis_client)
+
+    service = ActionTaskService()
+    task_id = await service.submit(BlockingGraphService(), "expand-node", [], "user-1")
+    await asyncio.sleep(0)
+    await service.shutdown()
+
+    assert not service._tasks
+    frames = [frame async for frame in service.stream_events(task_id, "user-1")]
+    assert '"status_code":503' in frames[-1]